@@ -0,0 +1,64 @@
+"""
+Tile-inference benchmark: update cost per move and deal samples per second.
+
+Replays recorded greedy-vs-greedy hands from seat 0's point of view,
+timing each observation, the posterior recomputed after it, and
+consistent-deal sampling at every position.
+
+    cd backend && python -m benchmarks.inference
+"""
+import random
+import time
+
+from dominoes.types import Domino
+from dominoes.rules import place_tile
+from dominoes.inference import TileTracker
+from bots.arena import run_arena
+from bots.greedy_bot import GreedyBot
+
+
+def main(num_matches: int = 20, samples_per_position: int = 20):
+    random.seed(0)
+    results = run_arena(GreedyBot(), GreedyBot(), num_matches, 200)
+    rng = random.Random(0)
+
+    moves = 0
+    observe_time = 0.0
+    posterior_time = 0.0
+    samples = 0
+    sample_time = 0.0
+    for match in results["matches"]:
+        for hand in match["hands"]:
+            tracker = TileTracker(0, [Domino(a, b) for a, b in hand["starting_hands"][0]])
+            layout = []
+            ends = None
+            for move in hand["moves"]:
+                t0 = time.perf_counter()
+                if move["end"] == "pass":
+                    tracker.observe_pass(move["player"], ends)
+                else:
+                    tile = Domino(*move["tile"])
+                    tracker.observe_play(move["player"], tile)
+                t1 = time.perf_counter()
+                tracker.posterior()
+                t2 = time.perf_counter()
+                for _ in range(samples_per_position):
+                    tracker.sample_deal(rng)
+                t3 = time.perf_counter()
+                if move["end"] != "pass":
+                    ends = place_tile(layout, ends, tile, move["end"])
+
+                moves += 1
+                observe_time += t1 - t0
+                posterior_time += t2 - t1
+                samples += samples_per_position
+                sample_time += t3 - t2
+
+    print(f"moves observed           {moves}")
+    print(f"observe per move         {observe_time / moves * 1e6:8.2f} us")
+    print(f"posterior per move       {posterior_time / moves * 1e6:8.2f} us")
+    print(f"deal samples per second  {samples / sample_time:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+Load generator for the match API.
+
+Simulates N concurrent human players, each driving start_match, play,
+pass and next_hand until its match is over, optionally while arena runs
+execute alongside them. Requests go straight to the ASGI app in this
+process by default, to a uvicorn server it spawns with --spawn-server, or
+to an already running server with --url. No external services are needed.
+
+Reports overall throughput, p50/p99 latency per endpoint and the server's
+resident memory growth.
+
+    cd backend && python -m benchmarks.loadtest --players 50 --arena-runs 2
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from urllib.parse import urlsplit
+from uuid import uuid4
+
+BOTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bots")
+
+
+class ASGITransport:
+    """Calls an ASGI app directly, without a socket."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, path: str, body: bytes = b"", content_type: str = "application/json"):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"loadtest"),
+                (b"content-type", content_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+        }
+        request_sent = False
+        response_done = asyncio.Event()
+        status = 0
+        chunks = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        await self.app(scope, receive, send)
+        return status, b"".join(chunks)
+
+
+class HTTPTransport:
+    """Plain HTTP/1.1 against a running server, one connection per request."""
+
+    def __init__(self, base_url: str, max_in_flight: int):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        # one thread per simulated client; the default executor would cap
+        # requests in flight at min(32, cpus + 4)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+
+    def _request(self, method, path, body, content_type):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=600)
+        try:
+            conn.request(method, path, body=body, headers={"Content-Type": content_type})
+            resp = conn.getresponse()
+            return resp.status, resp.read()
+        finally:
+            conn.close()
+
+    async def request(self, method: str, path: str, body: bytes = b"", content_type: str = "application/json"):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._request, method, path, body, content_type)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    async def call(self, transport, endpoint: str, method: str, path: str, payload=None, body: bytes = b"", content_type="application/json"):
+        if payload is not None:
+            body = json.dumps(payload).encode()
+        t0 = time.perf_counter()
+        status, data = await transport.request(method, path, body, content_type)
+        self.latencies.setdefault(endpoint, []).append(time.perf_counter() - t0)
+        if status != 200:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            raise RuntimeError(f"{method} {path} -> {status}: {data[:200]!r}")
+        return json.loads(data)
+
+    def report(self) -> dict:
+        out = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            out[endpoint] = {
+                "requests": len(samples),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": round(_percentile(samples, 50) * 1000, 2),
+                "p99_ms": round(_percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return out
+
+
+def _percentile(sorted_samples: list[float], pct: float) -> float:
+    k = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[k]
+
+
+def choose_human_move(state: dict) -> Optional[tuple[int, str]]:
+    hand = state["players"][0]["hand"]
+    ends = state["hand_state"]["ends"]
+    if ends is None:
+        return (0, "start") if hand else None
+    for i, tile in enumerate(hand):
+        if ends["left"] in (tile["a"], tile["b"]):
+            return i, "left"
+        if ends["right"] in (tile["a"], tile["b"]):
+            return i, "right"
+    return None
+
+
+async def play_one_match(transport, rec: Recorder, target_points: int, mode: str) -> None:
+    resp = await rec.call(transport, "start", "POST", "/api/match", {"target_points": target_points, "mode": mode})
+    game_id = resp["gameId"]
+    while True:
+        state = resp["state"]
+        version = resp["version"]
+        if state["match_over"]:
+            return
+        base = f"/api/match/{game_id}"
+        if state["last_hand_result"] is not None:
+            resp = await rec.call(transport, "next_hand", "POST", base + "/next_hand", {"version": version})
+            continue
+        move = choose_human_move(state)
+        if move is None:
+            resp = await rec.call(transport, "pass", "POST", base + "/pass", {"version": version})
+        else:
+            tile_index, end = move
+            resp = await rec.call(
+                transport, "play", "POST", base + "/play",
+                {"tile_index": tile_index, "end": end, "version": version},
+            )
+
+
+def _multipart(fields: dict, files: dict) -> tuple[bytes, str]:
+    boundary = uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: text/x-python\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+async def run_arena_once(transport, rec: Recorder, num_matches: int) -> None:
+    files = {}
+    for field, filename in (("bot_a", "greedy_bot.py"), ("bot_b", "random_bot.py")):
+        with open(os.path.join(BOTS_DIR, filename), "rb") as f:
+            files[field] = (filename, f.read())
+    body, content_type = _multipart({"num_matches": num_matches, "target_points": 200}, files)
+    await rec.call(transport, "arena_run", "POST", "/api/arena/run", body=body, content_type=content_type)
+
+
+def rss_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Resident memory of a process (this one by default), Linux only."""
+    try:
+        with open(f"/proc/{pid or 'self'}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+async def run_load(transport, players: int, matches_per_player: int, target_points: int,
+                   mode: str, arena_runs: int, arena_matches: int, server_rss) -> dict:
+    rec = Recorder()
+    completed = 0
+    failures = 0
+
+    async def player():
+        nonlocal completed, failures
+        for _ in range(matches_per_player):
+            try:
+                await play_one_match(transport, rec, target_points, mode)
+                completed += 1
+            except RuntimeError as e:
+                failures += 1
+                print(e, file=sys.stderr)
+
+    async def arena():
+        try:
+            await run_arena_once(transport, rec, arena_matches)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+
+    rss_before = server_rss()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(player() for _ in range(players)), *(arena() for _ in range(arena_runs)))
+    elapsed = time.perf_counter() - t0
+    rss_after = server_rss()
+
+    total_requests = sum(len(v) for v in rec.latencies.values())
+    return {
+        "players": players,
+        "arena_runs": arena_runs,
+        "elapsed_seconds": round(elapsed, 2),
+        "matches_completed": completed,
+        "matches_failed": failures,
+        "requests": total_requests,
+        "requests_per_second": round(total_requests / elapsed, 1),
+        "matches_per_second": round(completed / elapsed, 2),
+        "rss_before_mb": round(rss_before / 2**20, 1) if rss_before else None,
+        "rss_after_mb": round(rss_after / 2**20, 1) if rss_after else None,
+        "rss_growth_mb": round((rss_after - rss_before) / 2**20, 1) if rss_before and rss_after else None,
+        "endpoints": rec.report(),
+    }
+
+
+def spawn_server(workers: int) -> tuple[subprocess.Popen, str, Optional[str]]:
+    """Start uvicorn; with several workers they share a temporary store directory."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ)
+    store_dir = None
+    if workers > 1:
+        store_dir = tempfile.mkdtemp(prefix="dominoes_store_", dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+        env["DOMINOES_STORE_DIR"] = store_dir
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(BOTS_DIR),
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return proc, f"http://127.0.0.1:{port}", store_dir
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    if store_dir is not None:
+        shutil.rmtree(store_dir, ignore_errors=True)
+    raise RuntimeError("Server did not start within 30s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the match API")
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--matches-per-player", type=int, default=1)
+    parser.add_argument("--target-points", type=int, default=200)
+    parser.add_argument("--mode", choices=["ffa", "teams"], default="ffa")
+    parser.add_argument("--arena-runs", type=int, default=0, help="concurrent arena runs to mix in")
+    parser.add_argument("--arena-matches", type=int, default=200)
+    parser.add_argument("--url", help="test a running server instead of the in-process app")
+    parser.add_argument("--spawn-server", action="store_true", help="start a local uvicorn server to test")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn-server")
+    args = parser.parse_args()
+
+    proc = None
+    store_dir = None
+    in_flight = args.players + args.arena_runs
+    if args.spawn_server:
+        proc, url, store_dir = spawn_server(args.workers)
+        transport = HTTPTransport(url, in_flight)
+        # with several workers the spawned process is only a supervisor
+        server_rss = (lambda: rss_bytes(proc.pid)) if args.workers == 1 else (lambda: None)
+    elif args.url:
+        transport = HTTPTransport(args.url, in_flight)
+        server_rss = lambda: None
+    else:
+        from main import app
+        transport = ASGITransport(app)
+        server_rss = rss_bytes
+
+    try:
+        report = asyncio.run(run_load(
+            transport, args.players, args.matches_per_player, args.target_points,
+            args.mode, args.arena_runs, args.arena_matches, server_rss,
+        ))
+    finally:
+        if isinstance(transport, HTTPTransport):
+            transport.executor.shutdown()
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+        if store_dir is not None:
+            shutil.rmtree(store_dir, ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
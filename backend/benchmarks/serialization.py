@@ -0,0 +1,118 @@
+"""
+Serialization benchmark: bytes and microseconds per payload.
+
+Compares the original per-request dict building (kept here verbatim as a
+baseline) with the cached tile encodings in object and compact array form,
+and, when FastAPI is installed, the default jsonable_encoder + JSONResponse
+path with FastJSONResponse.
+
+    cd backend && python -m benchmarks.serialization
+"""
+import json
+import random
+import timeit
+
+from dominoes.types import MatchConfig, GameMode
+from dominoes.game import MatchState
+from bots.arena import run_single_match, match_to_dict
+from bots.greedy_bot import GreedyBot
+
+
+def legacy_to_dict(match: MatchState) -> dict:
+    hs = match.hand_state
+    return {
+        "config": {
+            "target_points": match.config.target_points,
+            "mode": match.config.mode.name,
+            "capicu_bonus": match.config.capicu_bonus,
+            "chuchazo_bonus": match.config.chuchazo_bonus,
+        },
+        "players": [
+            {"index": p.index, "score": p.score, "hand": [{"a": t.a, "b": t.b} for t in p.hand]}
+            for p in match.players
+        ],
+        "hand_state": {
+            "layout": [{"a": t.a, "b": t.b} for t in hs.layout],
+            "ends": {"left": hs.ends[0], "right": hs.ends[1]} if hs.ends is not None else None,
+            "current_player": hs.current_player,
+            "passes_in_a_row": hs.passes_in_a_row,
+            "last_move_blocked": hs.last_move_blocked,
+        },
+        "last_hand_result": None,
+        "match_over": match.is_match_over(),
+    }
+
+
+def mid_hand_match() -> MatchState:
+    """A match with a half-built layout, as seen on a typical /play response."""
+    from dominoes.rules import legal_moves_for_hand
+
+    match = MatchState.new_with_default_bots(MatchConfig(target_points=200, mode=GameMode.FFA))
+    match.start_new_hand()
+    bot = GreedyBot()
+    for _ in range(10):
+        hs = match.hand_state
+        player = match.players[hs.current_player]
+        if legal_moves_for_hand(player.hand, hs.ends):
+            tile, end = bot.choose_move(player.hand, hs.ends)
+            match.play_tile(hs.current_player, tile, end)
+        else:
+            match.pass_turn()
+        match.next_player()
+    return match
+
+
+def measure(label: str, fn, number: int = 2000) -> None:
+    payload = fn()
+    size = len(payload) if isinstance(payload, bytes) else len(json.dumps(payload, separators=(",", ":")))
+    usec = min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+    print(f"{label:<44} {size:>8} B {usec:>10.1f} us")
+
+
+def main():
+    random.seed(0)
+    match = mid_hand_match()
+    config = MatchConfig(target_points=200, mode=GameMode.TEAMS)
+    record = run_single_match([GreedyBot()] * 4, config, 0)
+
+    print(f"{'payload':<44} {'size':>10} {'time':>13}")
+    measure("MatchState legacy to_dict", lambda: legacy_to_dict(match))
+    measure("MatchState to_dict (object tiles)", lambda: match.to_dict())
+    measure("MatchState to_dict (array tiles)", lambda: match.to_dict(compact=True))
+    measure("arena match_to_dict", lambda: match_to_dict(record), number=200)
+
+    try:
+        from fastapi.encoders import jsonable_encoder
+        from fastapi.responses import JSONResponse
+        from responses import FastJSONResponse
+    except ImportError:
+        print("fastapi not installed; skipping response benchmarks")
+        return
+
+    state = {"gameId": "x", "version": 0}
+    measure(
+        "match response, legacy + JSONResponse",
+        lambda: JSONResponse(jsonable_encoder({**state, "state": legacy_to_dict(match)})).body,
+    )
+    measure(
+        "match response, object tiles + FastJSON",
+        lambda: FastJSONResponse({**state, "state": match.to_dict()}).body,
+    )
+    measure(
+        "match response, array tiles + FastJSON",
+        lambda: FastJSONResponse({**state, "state": match.to_dict(compact=True)}).body,
+    )
+    measure(
+        "arena match response, JSONResponse",
+        lambda: JSONResponse(jsonable_encoder(match_to_dict(record))).body,
+        number=50,
+    )
+    measure(
+        "arena match response, FastJSON",
+        lambda: FastJSONResponse(match_to_dict(record)).body,
+        number=50,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Online accumulators for arena runs.
+
+Each metric consumes match records as they finish and keeps only O(1)
+state, so run_arena can report deeper statistics without retaining the
+records. Means come with Welford variance and a normal-approximation 95%
+confidence interval.
+"""
+import math
+
+from dominoes.tiles import generate_double_six_set
+from bots.arena import HandRecord, MatchRecord
+
+
+class RunningStat:
+    """Welford's online mean/variance."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, x: float) -> None:
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+
+    def merge(self, other: "RunningStat") -> None:
+        """Combine with another stream's statistics (Chan et al.)."""
+        if other.count == 0:
+            return
+        n = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / n
+        self._m2 += other._m2 + delta * delta * self.count * other.count / n
+        self.count = n
+
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def ci95(self) -> tuple[float, float]:
+        if self.count == 0:
+            return (0.0, 0.0)
+        half = 1.96 * math.sqrt(self.variance() / self.count)
+        return (self.mean - half, self.mean + half)
+
+    def to_dict(self) -> dict:
+        lo, hi = self.ci95()
+        return {
+            "count": self.count,
+            "mean": round(self.mean, 4),
+            "variance": round(self.variance(), 4),
+            "ci95": [round(lo, 4), round(hi, 4)],
+        }
+
+
+class Metric:
+    """Base class for arena metrics. Override add_hand and/or add_match."""
+
+    name = ""
+
+    def add_match(self, rec: MatchRecord) -> None:
+        for hand in rec.hands:
+            self.add_hand(hand)
+
+    def add_hand(self, hand: HandRecord) -> None:
+        pass
+
+    def merge(self, other: "Metric") -> None:
+        """Fold in the same metric computed over other matches."""
+        raise NotImplementedError
+
+    def report(self) -> dict:
+        raise NotImplementedError
+
+
+class BonusFrequency(Metric):
+    """Per-team rate of hands won by capicú or chuchazo."""
+
+    name = "bonus_frequency"
+
+    def __init__(self):
+        self.capicu = [RunningStat(), RunningStat()]
+        self.chuchazo = [RunningStat(), RunningStat()]
+
+    def add_hand(self, hand: HandRecord) -> None:
+        winner_team = hand.winner_team
+        for team in (0, 1):
+            won = team == winner_team
+            self.capicu[team].push(1.0 if won and hand.capicu else 0.0)
+            self.chuchazo[team].push(1.0 if won and hand.chuchazo else 0.0)
+
+    def merge(self, other: "BonusFrequency") -> None:
+        for team in (0, 1):
+            self.capicu[team].merge(other.capicu[team])
+            self.chuchazo[team].merge(other.chuchazo[team])
+
+    def report(self) -> dict:
+        return {
+            "capicu_a": self.capicu[0].to_dict(),
+            "capicu_b": self.capicu[1].to_dict(),
+            "chuchazo_a": self.chuchazo[0].to_dict(),
+            "chuchazo_b": self.chuchazo[1].to_dict(),
+        }
+
+
+class StartingSeatAdvantage(Metric):
+    """How often the team that leads a hand also wins it, overall and per seat."""
+
+    name = "starting_seat_advantage"
+
+    def __init__(self):
+        self.overall = RunningStat()
+        self.by_seat = [RunningStat() for _ in range(4)]
+
+    def add_hand(self, hand: HandRecord) -> None:
+        won = 1.0 if hand.winner_team == hand.first_player % 2 else 0.0
+        self.overall.push(won)
+        self.by_seat[hand.first_player].push(won)
+
+    def merge(self, other: "StartingSeatAdvantage") -> None:
+        self.overall.merge(other.overall)
+        for mine, theirs in zip(self.by_seat, other.by_seat):
+            mine.merge(theirs)
+
+    def report(self) -> dict:
+        return {
+            "leader_team_win_rate": self.overall.to_dict(),
+            "by_seat": [s.to_dict() for s in self.by_seat],
+        }
+
+
+class PointsPerHand(Metric):
+    """Points scored by the winning team per hand, with a fixed-bin histogram."""
+
+    name = "points_per_hand"
+    bin_width = 25
+    num_bins = 16
+
+    def __init__(self):
+        self.stat = RunningStat()
+        self.histogram = [0] * self.num_bins
+
+    def add_hand(self, hand: HandRecord) -> None:
+        points = max(hand.points_earned.values())
+        self.stat.push(points)
+        self.histogram[min(points // self.bin_width, self.num_bins - 1)] += 1
+
+    def merge(self, other: "PointsPerHand") -> None:
+        self.stat.merge(other.stat)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def report(self) -> dict:
+        return {
+            **self.stat.to_dict(),
+            "bin_width": self.bin_width,
+            "histogram": self.histogram,
+        }
+
+
+class HandLength(Metric):
+    """Number of turns (plays and passes) per hand."""
+
+    name = "hand_length"
+
+    def __init__(self):
+        self.turns = RunningStat()
+        self.plays = RunningStat()
+
+    def add_hand(self, hand: HandRecord) -> None:
+        self.turns.push(len(hand.moves))
+        self.plays.push(sum(1 for m in hand.moves if m.end != "pass"))
+
+    def merge(self, other: "HandLength") -> None:
+        self.turns.merge(other.turns)
+        self.plays.merge(other.plays)
+
+    def report(self) -> dict:
+        return {"turns": self.turns.to_dict(), "plays": self.plays.to_dict()}
+
+
+class TileWinContribution(Metric):
+    """For each tile, how often the team dealt that tile goes on to win the hand."""
+
+    name = "tile_win_contribution"
+
+    def __init__(self):
+        self.tiles = [(t.a, t.b) for t in generate_double_six_set()]
+        self.stats = {t: RunningStat() for t in self.tiles}
+
+    def add_hand(self, hand: HandRecord) -> None:
+        winner_team = hand.winner_team
+        for seat, tiles in enumerate(hand.starting_hands):
+            won = 1.0 if seat % 2 == winner_team else 0.0
+            for a, b in tiles:
+                self.stats[(min(a, b), max(a, b))].push(won)
+
+    def merge(self, other: "TileWinContribution") -> None:
+        for tile, stat in self.stats.items():
+            stat.merge(other.stats[tile])
+
+    def report(self) -> dict:
+        return {f"{a}-{b}": self.stats[(a, b)].to_dict() for a, b in self.tiles}
+
+
+def default_metrics() -> list[Metric]:
+    return [
+        BonusFrequency(),
+        StartingSeatAdvantage(),
+        PointsPerHand(),
+        HandLength(),
+        TileWinContribution(),
+    ]
@@ -4,7 +4,9 @@ Arena engine for bot-vs-bot simulation in 2v2 teams format.
 Team A consists of players 0 and 2, Team B consists of players 1 and 3.
 Records all moves for later replay and analysis.
 """
+import os
 import time
+import pickle
 import random
 import traceback
 from dataclasses import dataclass, field
@@ -12,9 +14,19 @@ from typing import Optional
 
 from dominoes.types import Domino, MatchConfig, PlayerState, GameMode
 from dominoes.tiles import generate_double_six_set
-from dominoes.rules import legal_moves_for_hand
-from dominoes.scoring import compute_hand_scores_teams
+from dominoes.rules import legal_moves_for_hand, place_tile
+from dominoes.scoring import compute_hand_scores_teams, is_capicu, winning_team
 from dominoes.bots import BotBase
+from dominoes.encoding import encode_pair
+from fileutil import atomic_write
+
+
+class IllegalMoveError(ValueError):
+    """A bot chose a tile it does not hold or one that does not fit the chosen end."""
+
+    def __init__(self, seat: int, move):
+        super().__init__(f"Player {seat} made an illegal move: {move!r}")
+        self.seat = seat
 
 
 @dataclass
@@ -31,7 +43,10 @@ class HandRecord:
     first_player: int
     moves: list[MoveRecord] = field(default_factory=list)
     winner: int = -1
+    winner_team: int = -1
     blocked: bool = False
+    capicu: bool = False
+    chuchazo: bool = False
     points_earned: dict[int, int] = field(default_factory=dict)
     final_layout: list[tuple[int, int]] = field(default_factory=list)
     final_ends: Optional[tuple[int, int]] = None
@@ -45,20 +60,33 @@ class MatchRecord:
     winner_team: int = -1
 
 
-def run_single_hand(
+def play_hand(
     players: list[PlayerState],
-    bots: list[BotBase],
     config: MatchConfig,
     start_player: int,
-) -> HandRecord:
-    """Execute a single hand and return the hand record."""
-    tiles = generate_double_six_set()
-    random.shuffle(tiles)
-    for p in players:
-        p.hand.clear()
-    for _ in range(7):
+    deal: Optional[list[list[Domino]]] = None,
+    rng=random,
+):
+    """
+    Generator that plays a single hand.
+
+    Yields (seat, hand, ends) whenever a bot decision is needed and expects
+    the chosen move (or None) to be sent back; an illegal move raises
+    IllegalMoveError. Returns the hand record.
+    A fixed `deal` (one tile list per seat) replaces the shuffle by `rng`.
+    """
+    if deal is None:
+        tiles = generate_double_six_set()
+        rng.shuffle(tiles)
         for p in players:
-            p.hand.append(tiles.pop())
+            p.hand.clear()
+        for _ in range(7):
+            for p in players:
+                p.hand.append(tiles.pop())
+    else:
+        for p, tiles in zip(players, deal):
+            p.hand.clear()
+            p.hand.extend(tiles)
 
     rec = HandRecord(
         starting_hands=[[(t.a, t.b) for t in p.hand] for p in players],
@@ -87,7 +115,7 @@ def run_single_hand(
             cp = (cp + 1) % 4
             continue
 
-        result = bots[cp].choose_move(hand, ends)
+        result = yield cp, hand, ends
         if result is None:
             passes += 1
             rec.moves.append(MoveRecord(cp, -1, -1, "pass"))
@@ -95,31 +123,12 @@ def run_single_hand(
             continue
 
         tile, end = result
+        if tile not in hand or (ends is not None and (tile, end) not in legal):
+            raise IllegalMoveError(cp, result)
         passes = 0
         winning_tile = tile
         ends_before = ends
-        if ends is None:
-            layout.append(tile)
-            ends = (tile.a, tile.b)
-        else:
-            left, right = ends
-            if end == "left":
-                if tile.a == left:
-                    layout.insert(0, Domino(tile.b, tile.a))
-                    ends = (tile.b, right)
-                elif tile.b == left:
-                    layout.insert(0, tile)
-                    ends = (tile.a, right)
-            elif end == "right":
-                if tile.a == right:
-                    layout.append(tile)
-                    ends = (left, tile.b)
-                elif tile.b == right:
-                    layout.append(Domino(tile.b, tile.a))
-                    ends = (left, tile.a)
-            elif end == "start":
-                layout.append(tile)
-                ends = (tile.a, tile.b)
+        ends = place_tile(layout, ends, tile, end)
 
         hand.remove(tile)
         rec.moves.append(MoveRecord(cp, tile.a, tile.b, end))
@@ -147,26 +156,25 @@ def run_single_hand(
         p.score += deltas[i]
 
     rec.winner = winner
+    rec.winner_team = winning_team(hands_pips, winner, blocked)
     rec.blocked = blocked
+    rec.capicu = not blocked and is_capicu(ends_before, ends)
+    rec.chuchazo = not blocked and winning_tile is not None and winning_tile.is_double_blank()
     rec.points_earned = deltas
     rec.final_layout = [(t.a, t.b) for t in layout]
     rec.final_ends = ends
     return rec
 
 
-def run_single_match(
-    bots: list[BotBase],
-    config: MatchConfig,
-    match_idx: int,
-) -> MatchRecord:
-    """Execute a complete match up to target points."""
+def play_match(config: MatchConfig, match_idx: int, rng=random):
+    """Generator that plays a complete match; see play_hand for the protocol."""
     players = [PlayerState(index=i) for i in range(4)]
     rec = MatchRecord(match_index=match_idx)
 
     hand_num = 0
     while True:
-        start = random.randint(0, 3)
-        hand_rec = run_single_hand(players, bots, config, start)
+        start = rng.randint(0, 3)
+        hand_rec = yield from play_hand(players, config, start, rng=rng)
         rec.hands.append(hand_rec)
         hand_num += 1
 
@@ -184,63 +192,314 @@ def run_single_match(
     return rec
 
 
+def _drive(steps, bots: list[BotBase]):
+    """Run a play_hand/play_match generator to completion, one decision at a time."""
+    try:
+        seat, hand, ends = next(steps)
+        while True:
+            seat, hand, ends = steps.send(bots[seat].choose_move(hand, ends))
+    except StopIteration as stop:
+        return stop.value
+
+
+def run_single_hand(
+    players: list[PlayerState],
+    bots: list[BotBase],
+    config: MatchConfig,
+    start_player: int,
+    deal: Optional[list[list[Domino]]] = None,
+) -> HandRecord:
+    """Execute a single hand and return the hand record."""
+    return _drive(play_hand(players, config, start_player, deal), bots)
+
+
+def run_single_match(
+    bots: list[BotBase],
+    config: MatchConfig,
+    match_idx: int,
+    rng=random,
+) -> MatchRecord:
+    """Execute a complete match up to target points."""
+    return _drive(play_match(config, match_idx, rng), bots)
+
+
+def derive_seed(seed: int, idx: int) -> int:
+    """Seed for the idx-th independent stream (match, shard, iteration) of a seeded run."""
+    return seed * 1_000_003 + idx
+
+
+def match_rng(seed: Optional[int], match_idx: int):
+    """Independent RNG for one match of a seeded run; the global RNG when unseeded."""
+    if seed is None:
+        return random
+    return random.Random(derive_seed(seed, match_idx))
+
+
+def run_matches_interleaved(
+    bots: list[BotBase],
+    config: MatchConfig,
+    match_indices,
+    concurrency: int = 64,
+    stats: Optional[dict] = None,
+    seed: Optional[int] = None,
+):
+    """
+    Play many matches side by side, batching decisions per bot.
+
+    Keeps up to `concurrency` matches in flight. Each round gathers every
+    match's pending decision, groups them by bot and answers each group
+    with a single choose_moves_batch call. Yields match records as they
+    finish, which is not necessarily index order. Batch counts and timing
+    are added to `stats`, if given, once the generator is exhausted.
+    """
+    indices = iter(match_indices)
+    finished = []
+    active = []
+    batches = 0
+    decisions = 0
+    max_batch = 0
+
+    def admit():
+        while len(active) < concurrency:
+            idx = next(indices, None)
+            if idx is None:
+                return
+            steps = play_match(config, idx, match_rng(seed, idx))
+            try:
+                active.append((steps, next(steps)))
+            except StopIteration as stop:
+                finished.append(stop.value)
+
+    t0 = time.time()
+    admit()
+    while active or finished:
+        yield from finished
+        finished.clear()
+        if not active:
+            break
+        groups: dict[int, tuple[BotBase, list]] = {}
+        for entry in active:
+            bot = bots[entry[1][0]]
+            groups.setdefault(id(bot), (bot, []))[1].append(entry)
+
+        active = []
+        for bot, entries in groups.values():
+            moves = list(bot.choose_moves_batch([(hand, ends) for _, (_, hand, ends) in entries]))
+            if len(moves) != len(entries):
+                raise ValueError(
+                    f"{type(bot).__name__}.choose_moves_batch returned {len(moves)} moves "
+                    f"for {len(entries)} positions"
+                )
+            batches += 1
+            decisions += len(entries)
+            max_batch = max(max_batch, len(entries))
+            for (steps, _), move in zip(entries, moves):
+                try:
+                    active.append((steps, steps.send(move)))
+                except StopIteration as stop:
+                    finished.append(stop.value)
+        admit()
+    elapsed = time.time() - t0
+
+    if stats is not None:
+        stats["batches"] = stats.get("batches", 0) + batches
+        stats["decisions"] = stats.get("decisions", 0) + decisions
+        stats["max_batch_size"] = max(stats.get("max_batch_size", 0), max_batch)
+        stats["seconds"] = stats.get("seconds", 0.0) + elapsed
+
+
+class CheckpointMismatchError(ValueError):
+    pass
+
+
+@dataclass
+class ArenaProgress:
+    """Running aggregates of an arena run; pickled as its checkpoint."""
+
+    num_matches: int
+    target_points: int
+    seed: Optional[int]
+    keep_matches: Optional[int]
+    metrics: list
+    bots: str = ""
+    next_match: int = 0
+    team_a_wins: int = 0
+    team_b_wins: int = 0
+    total_hands: int = 0
+    total_points_a: int = 0
+    total_points_b: int = 0
+    blocked_hands: int = 0
+    elapsed: float = 0.0
+    kept: list[MatchRecord] = field(default_factory=list)
+    batching: Optional[dict] = None
+
+    def add(self, rec: MatchRecord) -> None:
+        if self.keep_matches is None or rec.match_index < self.keep_matches:
+            self.kept.append(rec)
+        for metric in self.metrics:
+            metric.add_match(rec)
+
+        if rec.winner_team == 0:
+            self.team_a_wins += 1
+        else:
+            self.team_b_wins += 1
+
+        self.total_hands += len(rec.hands)
+        self.total_points_a += rec.final_scores[0]
+        self.total_points_b += rec.final_scores[1]
+        self.blocked_hands += sum(1 for h in rec.hands if h.blocked)
+
+    def merge(self, other: "ArenaProgress") -> None:
+        """Fold in the progress of a disjoint set of matches from the same run."""
+        for name in ("team_a_wins", "team_b_wins", "total_hands", "total_points_a",
+                     "total_points_b", "blocked_hands"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for mine, theirs in zip(self.metrics, other.metrics):
+            mine.merge(theirs)
+        self.kept.extend(other.kept)
+        if other.batching is not None:
+            if self.batching is None:
+                self.batching = dict(other.batching)
+            else:
+                for key in ("batches", "decisions", "seconds"):
+                    self.batching[key] += other.batching[key]
+                self.batching["max_batch_size"] = max(
+                    self.batching["max_batch_size"], other.batching["max_batch_size"]
+                )
+
+    def save(self, path: str) -> None:
+        with atomic_write(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> "ArenaProgress":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def to_results(self) -> dict:
+        n = self.num_matches
+        results = {
+            "num_matches": n,
+            "target_points": self.target_points,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "team_a_wins": self.team_a_wins,
+            "team_b_wins": self.team_b_wins,
+            "team_a_win_pct": round(self.team_a_wins / n * 100, 1),
+            "team_b_win_pct": round(self.team_b_wins / n * 100, 1),
+            "total_hands": self.total_hands,
+            "avg_hands_per_match": round(self.total_hands / n, 1),
+            "avg_points_a": round(self.total_points_a / n, 1),
+            "avg_points_b": round(self.total_points_b / n, 1),
+            "blocked_hands": self.blocked_hands,
+            "blocked_pct": round(self.blocked_hands / self.total_hands * 100, 1) if self.total_hands else 0,
+            "analytics": {m.name: m.report() for m in self.metrics},
+            "matches": [match_to_dict(r) for r in sorted(self.kept, key=lambda r: r.match_index)],
+        }
+        if self.batching is not None:
+            b = self.batching
+            results["batching"] = {
+                "concurrency": b["concurrency"],
+                "batches": b["batches"],
+                "decisions": b["decisions"],
+                "avg_batch_size": round(b["decisions"] / b["batches"], 1) if b["batches"] else 0,
+                "max_batch_size": b["max_batch_size"],
+                "decisions_per_second": round(b["decisions"] / b["seconds"]) if b["seconds"] > 0 else 0,
+            }
+        return results
+
+
 def run_arena(
     bot_a: BotBase,
     bot_b: BotBase,
     num_matches: int = 1000,
     target_points: int = 200,
+    concurrency: int = 1,
+    metrics: Optional[list] = None,
+    keep_matches: Optional[int] = None,
+    seed: Optional[int] = None,
+    checkpoint_path: Optional[str] = None,
+    checkpoint_every: int = 100,
+    bots_fingerprint: Optional[str] = None,
 ) -> dict[str, any]:
     """
     Run multiple matches between two bots in teams format.
 
     Bot A uses players 0 and 2, Bot B uses players 1 and 3.
+    With concurrency > 1 matches are interleaved so that decisions reach
+    each bot's choose_moves_batch in batches. `metrics` are online
+    accumulators from bots.analytics (defaults to default_metrics()), fed
+    every match as it finishes; only the first `keep_matches` match
+    records (all if None) are retained in the result.
+
+    With a `seed`, every match draws from its own RNG, so results do not
+    depend on scheduling. With a `checkpoint_path` (seed defaults to 0,
+    keep_matches is required) progress is saved every `checkpoint_every` matches and an existing
+    checkpoint is resumed, giving the same results as an uninterrupted
+    run provided the bots themselves are deterministic (bots drawing from
+    the global random module, like RandomBot, are not). The checkpoint
+    only resumes for the same bots, identified by `bots_fingerprint`
+    (e.g. hashes of their sources; defaults to their class names). A
+    resumed run's results include the "resumed_from_match" it restarted at.
     Returns comprehensive statistics and match records.
     """
-    config = MatchConfig(target_points=target_points, mode=GameMode.TEAMS)
-    bots_list = [bot_a, bot_b, bot_a, bot_b]
-
-    records = []
-    team_a_wins = 0
-    team_b_wins = 0
-    total_hands = 0
-    total_points_a = 0
-    total_points_b = 0
-    blocked_hands = 0
-
-    t0 = time.time()
+    from bots.analytics import default_metrics
+
+    if bots_fingerprint is None:
+        bots_fingerprint = f"{type(bot_a).__qualname__}:{type(bot_b).__qualname__}"
+    if checkpoint_path is not None and keep_matches is None:
+        # every checkpoint re-pickles the kept records, so they must stay bounded
+        raise ValueError("Checkpointed arena runs need a keep_matches limit")
+    if checkpoint_path is not None and seed is None:
+        seed = 0
+    resumed_from = None
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        progress = ArenaProgress.load(checkpoint_path)
+        saved = (progress.num_matches, progress.target_points, progress.seed, progress.keep_matches, progress.bots)
+        if saved != (num_matches, target_points, seed, keep_matches, bots_fingerprint):
+            raise CheckpointMismatchError(f"Checkpoint {checkpoint_path} belongs to a different arena run")
+        resumed_from = progress.next_match
+    else:
+        progress = ArenaProgress(
+            num_matches=num_matches,
+            target_points=target_points,
+            seed=seed,
+            keep_matches=keep_matches,
+            metrics=default_metrics() if metrics is None else metrics,
+            bots=bots_fingerprint,
+        )
+    if concurrency > 1 and progress.batching is None:
+        progress.batching = {"concurrency": concurrency, "batches": 0, "decisions": 0, "max_batch_size": 0, "seconds": 0.0}
 
-    for i in range(num_matches):
-        rec = run_single_match(bots_list, config, i)
-        records.append(rec)
+    bots_list = [bot_a, bot_b, bot_a, bot_b]
+    block = checkpoint_every if checkpoint_path is not None else num_matches
 
-        if rec.winner_team == 0:
-            team_a_wins += 1
-        else:
-            team_b_wins += 1
+    while progress.next_match < num_matches:
+        indices = range(progress.next_match, min(progress.next_match + block, num_matches))
+        play_matches(progress, bots_list, indices, concurrency)
+        progress.next_match = indices.stop
+        if checkpoint_path is not None:
+            progress.save(checkpoint_path)
 
-        total_hands += len(rec.hands)
-        total_points_a += rec.final_scores[0]
-        total_points_b += rec.final_scores[1]
-        blocked_hands += sum(1 for h in rec.hands if h.blocked)
+    results = progress.to_results()
+    if resumed_from is not None:
+        results["resumed_from_match"] = resumed_from
+    return results
 
-    elapsed = time.time() - t0
 
-    return {
-        "num_matches": num_matches,
-        "target_points": target_points,
-        "elapsed_seconds": round(elapsed, 2),
-        "team_a_wins": team_a_wins,
-        "team_b_wins": team_b_wins,
-        "team_a_win_pct": round(team_a_wins / num_matches * 100, 1),
-        "team_b_win_pct": round(team_b_wins / num_matches * 100, 1),
-        "total_hands": total_hands,
-        "avg_hands_per_match": round(total_hands / num_matches, 1),
-        "avg_points_a": round(total_points_a / num_matches, 1),
-        "avg_points_b": round(total_points_b / num_matches, 1),
-        "blocked_hands": blocked_hands,
-        "blocked_pct": round(blocked_hands / total_hands * 100, 1) if total_hands else 0,
-        "matches": [match_to_dict(r) for r in records],
-    }
+def play_matches(progress: ArenaProgress, bots_list: list[BotBase], indices: range, concurrency: int = 1) -> None:
+    """Play the given match indices of a run and add them to its progress."""
+    t0 = time.time()
+    config = MatchConfig(target_points=progress.target_points, mode=GameMode.TEAMS)
+    seed = progress.seed
+    if concurrency > 1:
+        finished = run_matches_interleaved(
+            bots_list, config, indices, concurrency, progress.batching, seed
+        )
+    else:
+        finished = (run_single_match(bots_list, config, i, match_rng(seed, i)) for i in indices)
+    for rec in finished:
+        progress.add(rec)
+    progress.elapsed += time.time() - t0
 
 
 def match_to_dict(rec: MatchRecord) -> dict:
@@ -258,11 +517,14 @@ def hand_to_dict(rec: HandRecord) -> dict:
         "starting_hands": rec.starting_hands,
         "first_player": rec.first_player,
         "moves": [
-            {"player": m.player, "tile": [m.tile_a, m.tile_b], "end": m.end}
+            {"player": m.player, "tile": encode_pair(m.tile_a, m.tile_b), "end": m.end}
             for m in rec.moves
         ],
         "winner": rec.winner,
+        "winner_team": rec.winner_team,
         "blocked": rec.blocked,
+        "capicu": rec.capicu,
+        "chuchazo": rec.chuchazo,
         "points_earned": rec.points_earned,
         "final_layout": rec.final_layout,
         "final_ends": rec.final_ends,
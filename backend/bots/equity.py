@@ -0,0 +1,191 @@
+"""
+Opening-hand equity table.
+
+Every 7-tile starting hand is ranked into [0, C(28, 7)) with the
+combinatorial number system. For each hand and each seat in turn order
+(0 leads, 3 plays last) the builder estimates, by Monte Carlo against
+GreedyBot on all four seats, the probability that the holder's team wins
+the hand and its expected net points.
+
+The table is a flat file of fixed-size records that is memory-mapped for
+O(1) lookups. Building runs across a process pool and resumes where it
+stopped: a record with a sample count of zero has not been evaluated yet.
+
+    python -m bots.equity equity_table.bin --samples 16 --workers 8
+"""
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+from multiprocessing import Pool
+from typing import Optional
+
+from dominoes.types import Domino, MatchConfig, PlayerState, GameMode
+from dominoes.tiles import generate_double_six_set
+from dominoes.bots import GreedyBot
+from bots.arena import run_single_hand, match_rng
+
+TILES = generate_double_six_set()
+TILE_INDEX = {(t.a, t.b): i for i, t in enumerate(TILES)}
+HAND_SIZE = 7
+NUM_HANDS = math.comb(len(TILES), HAND_SIZE)
+
+MAGIC = b"PRDEQ1\0\0"
+HEADER = struct.Struct("<8sII")  # magic, samples per seat, reserved
+RECORD = struct.Struct("<I8f")  # samples, then (win_prob, exp_points) per seat
+SEAT_VALUES = struct.Struct("<ff")
+
+_BINOM = [[math.comb(n, k) for k in range(HAND_SIZE + 1)] for n in range(len(TILES) + 1)]
+
+
+def tile_index(tile: Domino) -> int:
+    return TILE_INDEX[(min(tile.a, tile.b), max(tile.a, tile.b))]
+
+
+def rank_hand(hand: list[Domino]) -> int:
+    """Combinatorial index of a 7-tile hand; tile order does not matter."""
+    indices = sorted(tile_index(t) for t in hand)
+    if len(indices) != HAND_SIZE or len(set(indices)) != HAND_SIZE:
+        raise ValueError("A hand must contain 7 distinct tiles")
+    return sum(_BINOM[c][k + 1] for k, c in enumerate(indices))
+
+
+def unrank_hand(rank: int) -> list[int]:
+    """Inverse of rank_hand, returning sorted tile indices."""
+    indices = []
+    c = len(TILES)
+    for k in range(HAND_SIZE, 0, -1):
+        c -= 1
+        while _BINOM[c][k] > rank:
+            c -= 1
+        indices.append(c)
+        rank -= _BINOM[c][k]
+    return indices[::-1]
+
+
+def parse_hand(text: str) -> list[Domino]:
+    """Parse "0-0,3-5,..." into dominoes."""
+    try:
+        tiles = [Domino(*(int(x) for x in part.split("-"))) for part in text.split(",")]
+    except TypeError:
+        raise ValueError("Tiles must look like a-b")
+    for t in tiles:
+        if (min(t.a, t.b), max(t.a, t.b)) not in TILE_INDEX:
+            raise ValueError(f"Invalid tile {t.a}-{t.b}")
+    return tiles
+
+
+class EquityTable:
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.samples, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or len(self._mm) != HEADER.size + NUM_HANDS * RECORD.size:
+            raise ValueError(f"{path} is not an equity table")
+
+    def lookup(self, hand: list[Domino], seat: int) -> Optional[tuple[float, float]]:
+        """(win probability, expected net points) or None if not yet built."""
+        offset = HEADER.size + rank_hand(hand) * RECORD.size
+        if struct.unpack_from("<I", self._mm, offset)[0] == 0:
+            return None
+        return SEAT_VALUES.unpack_from(self._mm, offset + 4 + seat * SEAT_VALUES.size)
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+_table: Optional[EquityTable] = None
+
+
+def get_table() -> Optional[EquityTable]:
+    """Shared table from DOMINOES_EQUITY_TABLE (default equity_table.bin), if built."""
+    global _table
+    if _table is None:
+        path = os.environ.get("DOMINOES_EQUITY_TABLE", "equity_table.bin")
+        if os.path.exists(path):
+            _table = EquityTable(path)
+    return _table
+
+
+def _evaluate_chunk(args) -> tuple[int, bytes]:
+    start, end, samples, seed = args
+    rng = match_rng(seed, start)
+    bots = [GreedyBot()] * 4
+    config = MatchConfig(target_points=200, mode=GameMode.TEAMS)
+    players = [PlayerState(index=i) for i in range(4)]
+    out = bytearray()
+    for rank in range(start, end):
+        held = unrank_hand(rank)
+        hand = [TILES[i] for i in held]
+        rest = [t for i, t in enumerate(TILES) if i not in held]
+        values = []
+        for seat in range(4):
+            wins = 0
+            points = 0
+            for _ in range(samples):
+                rng.shuffle(rest)
+                deal = [hand, rest[0:7], rest[7:14], rest[14:21]]
+                rec = run_single_hand(players, bots, config, (4 - seat) % 4, deal)
+                wins += rec.winner_team == 0
+                points += rec.points_earned[0] - rec.points_earned[1]
+            values += [wins / samples, points / samples]
+        out += RECORD.pack(samples, *values)
+    return start, bytes(out)
+
+
+def build_table(
+    path: str,
+    samples: int = 16,
+    workers: Optional[int] = None,
+    chunk_size: int = 2048,
+    seed: int = 0,
+    limit: Optional[int] = None,
+) -> None:
+    """Create or resume the table at `path`, evaluating the first `limit` hands (all if None)."""
+    size = HEADER.size + NUM_HANDS * RECORD.size
+    if not os.path.exists(path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, samples, 0))
+            f.truncate(size)
+
+    with open(path, "r+b") as f, mmap.mmap(f.fileno(), 0) as mm:
+        magic, existing_samples, _ = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC or len(mm) != size:
+            raise ValueError(f"{path} is not an equity table")
+        if existing_samples != samples:
+            raise ValueError(f"{path} was started with {existing_samples} samples per seat")
+
+        num_hands = NUM_HANDS if limit is None else min(limit, NUM_HANDS)
+        pending = []
+        for start in range(0, num_hands, chunk_size):
+            end = min(start + chunk_size, num_hands)
+            done = all(
+                struct.unpack_from("<I", mm, HEADER.size + r * RECORD.size)[0]
+                for r in range(start, end)
+            )
+            if not done:
+                pending.append((start, end, samples, seed))
+
+        print(f"{len(pending)} chunks to evaluate")
+        t0 = time.time()
+        with Pool(workers) as pool:
+            for n, (start, payload) in enumerate(pool.imap_unordered(_evaluate_chunk, pending), 1):
+                offset = HEADER.size + start * RECORD.size
+                mm[offset:offset + len(payload)] = payload
+                mm.flush()
+                print(f"chunk {n}/{len(pending)} done ({time.time() - t0:.0f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the opening-hand equity table")
+    parser.add_argument("path", nargs="?", default="equity_table.bin")
+    parser.add_argument("--samples", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=2048)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+    build_table(args.path, args.samples, args.workers, args.chunk_size, args.seed, args.limit)
@@ -0,0 +1,204 @@
+"""
+Persistent, versioned registry of uploaded bots.
+
+Sources are stored on disk by content hash. A bot is validated once, when
+it is registered: it must load, and it must play a short smoke match
+against GreedyBot returning only legal moves; the average choose_move
+latency from that match becomes part of its profile. Registered bots are
+kept warm in memory, and arena results are recorded against the exact
+version that produced them, in an append-only log per bot.
+
+The registry lives in DOMINOES_BOT_REGISTRY (default bot_registry/).
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional
+
+from dominoes.types import MatchConfig, GameMode
+from dominoes.rules import legal_moves_for_hand
+from dominoes.bots import BotBase, GreedyBot
+from bots.arena import run_single_match
+from bots.bot_loader import load_bot_from_source
+from fileutil import atomic_write
+
+SMOKE_MATCHES = 3
+SMOKE_TARGET_POINTS = 100
+RESULTS_SHOWN = 50
+
+
+class _TimedBot(BotBase):
+    """Wraps a bot to time choose_move and reject illegal moves."""
+
+    def __init__(self, bot: BotBase):
+        self.bot = bot
+        self.calls = 0
+        self.total_seconds = 0.0
+
+    def choose_move(self, hand, ends):
+        t0 = time.perf_counter()
+        move = self.bot.choose_move(hand, ends)
+        self.total_seconds += time.perf_counter() - t0
+        self.calls += 1
+        if move is not None and tuple(move) not in legal_moves_for_hand(hand, ends):
+            raise ValueError(f"choose_move returned an illegal move: {move!r}")
+        return move
+
+
+def smoke_test(bot: BotBase) -> dict:
+    """Play a few short matches against GreedyBot and profile the bot."""
+    timed = _TimedBot(bot)
+    greedy = GreedyBot()
+    config = MatchConfig(target_points=SMOKE_TARGET_POINTS, mode=GameMode.TEAMS)
+    wins = 0
+    hands = 0
+    for i in range(SMOKE_MATCHES):
+        rec = run_single_match([timed, greedy, timed, greedy], config, i)
+        wins += rec.winner_team == 0
+        hands += len(rec.hands)
+    return {
+        "smoke_matches": SMOKE_MATCHES,
+        "smoke_hands": hands,
+        "smoke_win_pct": round(wins / SMOKE_MATCHES * 100, 1),
+        "decisions": timed.calls,
+        "avg_choose_move_us": round(timed.total_seconds / timed.calls * 1e6, 1) if timed.calls else 0,
+    }
+
+
+class BotRegistry:
+    """
+    One JSON file per bot under entries/ and an append-only results log
+    per bot under results/, so several server processes can share the
+    directory: every read goes to disk, and writes hold an fcntl lock.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        for sub in ("sources", "entries", "results"):
+            os.makedirs(os.path.join(directory, sub), exist_ok=True)
+        self._warm: dict[str, BotBase] = {}
+
+    def _path(self, kind: str, name: str) -> str:
+        return os.path.join(self.directory, kind, name)
+
+    @contextmanager
+    def _locked(self):
+        import fcntl
+
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _read_entry(self, bot_id: str) -> dict:
+        if not re.fullmatch(r"[0-9a-f]{12}", bot_id):
+            raise KeyError(bot_id)
+        try:
+            with open(self._path("entries", bot_id + ".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(bot_id)
+
+    def _bot_ids(self) -> list[str]:
+        return [n[:-5] for n in os.listdir(os.path.join(self.directory, "entries")) if n.endswith(".json")]
+
+    def register(self, name: str, source: str) -> dict:
+        """
+        Validate and store a bot, returning its entry.
+
+        Re-registering identical source returns the existing entry; new
+        source under an existing name becomes that name's next version.
+        Raises ValueError (or the bot's own exception) if validation fails.
+        """
+        sha256 = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        bot_id = sha256[:12]
+        try:
+            return self.get_entry(bot_id)
+        except KeyError:
+            pass
+
+        bot = load_bot_from_source(source, bot_id)
+        profile = smoke_test(bot)
+
+        with self._locked():
+            try:
+                return self.get_entry(bot_id)
+            except KeyError:
+                pass
+            with open(self._path("sources", sha256 + ".py"), "w") as f:
+                f.write(source)
+            version = 1 + max(
+                (e["version"] for e in map(self._read_entry, self._bot_ids()) if e["name"] == name),
+                default=0,
+            )
+            entry = {
+                "id": bot_id,
+                "name": name,
+                "version": version,
+                "sha256": sha256,
+                "class_name": type(bot).__name__,
+                "registered_at": time.time(),
+                "profile": profile,
+            }
+            with atomic_write(self._path("entries", bot_id + ".json")) as f:
+                json.dump(entry, f, indent=1)
+        self._warm[bot_id] = bot
+        return self.get_entry(bot_id)
+
+    def get_entry(self, bot_id: str) -> dict:
+        """The bot's entry with its RESULTS_SHOWN most recent arena results."""
+        entry = self._read_entry(bot_id)
+        results = deque(maxlen=RESULTS_SHOWN)
+        num_results = 0
+        try:
+            with open(self._path("results", bot_id + ".jsonl")) as f:
+                for line in f:
+                    results.append(line)
+                    num_results += 1
+        except FileNotFoundError:
+            pass
+        entry["results"] = [json.loads(line) for line in results]
+        entry["num_results"] = num_results
+        return entry
+
+    def list_entries(self) -> list[dict]:
+        return sorted(map(self.get_entry, self._bot_ids()), key=lambda e: (e["name"], e["version"]))
+
+    def get_bot(self, bot_id: str) -> BotBase:
+        """Warm instance of a registered bot; sources are trusted, already validated."""
+        bot = self._warm.get(bot_id)
+        if bot is None:
+            entry = self._read_entry(bot_id)
+            with open(self._path("sources", entry["sha256"] + ".py")) as f:
+                bot = load_bot_from_source(f.read(), bot_id)
+            self._warm[bot_id] = bot
+        return bot
+
+    def preload(self) -> None:
+        for bot_id in self._bot_ids():
+            try:
+                self.get_bot(bot_id)
+            except Exception as e:
+                print(f"Could not preload bot {bot_id}: {e}")
+
+    def record_result(self, bot_id: str, result: dict) -> None:
+        self._read_entry(bot_id)
+        with self._locked():
+            with open(self._path("results", bot_id + ".jsonl"), "a") as f:
+                f.write(json.dumps(result) + "\n")
+
+
+_registry: Optional[BotRegistry] = None
+
+
+def get_registry() -> BotRegistry:
+    global _registry
+    if _registry is None:
+        _registry = BotRegistry(os.environ.get("DOMINOES_BOT_REGISTRY", "bot_registry"))
+    return _registry
@@ -0,0 +1,112 @@
+"""
+Replay engine for recorded arena hands.
+
+Rebuilds the board at any move of a hand from the dicts produced by
+match_to_dict/hand_to_dict. HandReplay stores a snapshot every `interval`
+moves, so reaching move k replays at most `interval` moves from the
+nearest checkpoint. iter_states scans a whole run with a single mutable
+state and never materializes more than one hand at a time.
+"""
+from dataclasses import dataclass, field
+
+from dominoes.types import Domino
+from dominoes.rules import place_tile
+from dominoes.game import HandState
+from dominoes.encoding import encode_tiles
+
+
+@dataclass
+class ReplayState:
+    move: int
+    hand_state: HandState
+    hands: list[list[Domino]] = field(default_factory=list)
+
+    def copy(self) -> "ReplayState":
+        hs = self.hand_state
+        return ReplayState(
+            move=self.move,
+            hand_state=HandState(
+                layout=list(hs.layout),
+                ends=hs.ends,
+                passes_in_a_row=hs.passes_in_a_row,
+                current_player=hs.current_player,
+                winning_tile=hs.winning_tile,
+                ends_before_last_move=hs.ends_before_last_move,
+            ),
+            hands=[list(h) for h in self.hands],
+        )
+
+    def to_dict(self) -> dict:
+        hs = self.hand_state
+        return {
+            "move": self.move,
+            "layout": encode_tiles(hs.layout),
+            "ends": {"left": hs.ends[0], "right": hs.ends[1]} if hs.ends is not None else None,
+            "current_player": hs.current_player,
+            "passes_in_a_row": hs.passes_in_a_row,
+            "hands": [encode_tiles(h) for h in self.hands],
+        }
+
+
+def initial_state(hand: dict) -> ReplayState:
+    return ReplayState(
+        move=0,
+        hand_state=HandState(current_player=hand["first_player"]),
+        hands=[[Domino(a, b) for a, b in tiles] for tiles in hand["starting_hands"]],
+    )
+
+
+def apply_move(state: ReplayState, move: dict) -> None:
+    hs = state.hand_state
+    if move["end"] == "pass":
+        hs.passes_in_a_row += 1
+    else:
+        tile = Domino(*move["tile"])
+        hs.ends_before_last_move = hs.ends
+        hs.ends = place_tile(hs.layout, hs.ends, tile, move["end"])
+        hs.passes_in_a_row = 0
+        hs.winning_tile = tile
+        state.hands[move["player"]].remove(tile)
+    hs.current_player = (move["player"] + 1) % 4
+    state.move += 1
+
+
+class HandReplay:
+    def __init__(self, hand: dict, interval: int = 8):
+        self.moves = hand["moves"]
+        self.interval = interval
+        state = initial_state(hand)
+        self.checkpoints = [state.copy()]
+        for move in self.moves:
+            apply_move(state, move)
+            if state.move % interval == 0:
+                self.checkpoints.append(state.copy())
+
+    @property
+    def num_moves(self) -> int:
+        return len(self.moves)
+
+    def state_at(self, k: int) -> ReplayState:
+        """State after the first k moves (0 is the deal, num_moves the end)."""
+        if not (0 <= k <= len(self.moves)):
+            raise IndexError(f"Move {k} is outside 0..{len(self.moves)}")
+        state = self.checkpoints[k // self.interval].copy()
+        for move in self.moves[state.move:k]:
+            apply_move(state, move)
+        return state
+
+
+def iter_states(matches):
+    """
+    Yield (match_index, hand_index, state) for every position of every hand.
+
+    The same ReplayState object is updated in place between yields; call
+    state.copy() to keep one.
+    """
+    for match in matches:
+        for h, hand in enumerate(match["hands"]):
+            state = initial_state(hand)
+            yield match["match_index"], h, state
+            for move in hand["moves"]:
+                apply_move(state, move)
+                yield match["match_index"], h, state
@@ -0,0 +1,294 @@
+"""
+Self-play dataset generation for training learned bots.
+
+Matches are played with run_single_match and every hand is walked again
+to emit one sample per decision the acting bot made: a fixed-width int16
+row holding the observation from that player's seat, the legal-move mask,
+the chosen action and the final outcome of the hand for the player's
+team. Rows are written to fixed-size shards in .npy format (written with
+the standard library, loadable with numpy.load(..., mmap_mode="r")) plus
+an index.json describing them.
+
+Shard k is generated from derive_seed(seed, k) alone, so output is
+deterministic regardless of worker count, and an interrupted run resumes
+by generating only the shards that are missing.
+
+    python -m bots.selfplay data/selfplay --shards 64 --shard-size 65536
+
+Row layout (see the *_SLICE constants), seats relative to the actor:
+    hand          28  1 if the actor holds tile i
+    played_by     28  0 if tile i is unplayed, else relative seat + 1
+    ends           2  left and right pip, -1 before the first tile
+    hand_sizes     4  tiles left per relative seat
+    voids         28  1 if relative seat s passed with pip v showing (s * 7 + v)
+    passes         1  passes in a row before this decision
+    scores         2  actor's team score, opponents' score before the hand
+    legal         56  action mask, action = tile * 2 + (1 if right else 0)
+    action         1  chosen action
+    won            1  1 if the actor's team won the hand
+    net_points     1  actor's team points minus opponents' for the hand
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import struct
+import sys
+import time
+from array import array
+from multiprocessing import Pool
+from typing import Optional
+
+from dominoes.types import Domino, MatchConfig, GameMode
+from dominoes.tiles import generate_double_six_set
+from dominoes.rules import legal_moves_for_hand, place_tile
+from bots.arena import HandRecord, run_single_match, derive_seed
+from bots.greedy_bot import GreedyBot
+from bots.random_bot import RandomBot
+from fileutil import atomic_write
+
+TILES = generate_double_six_set()
+TILE_INDEX = {t: i for i, t in enumerate(TILES)}
+
+HAND_SLICE = slice(0, 28)
+PLAYED_SLICE = slice(28, 56)
+ENDS_SLICE = slice(56, 58)
+SIZES_SLICE = slice(58, 62)
+VOIDS_SLICE = slice(62, 90)
+PASSES_COL = 90
+SCORES_SLICE = slice(91, 93)
+OBS_WIDTH = 93
+LEGAL_SLICE = slice(93, 149)
+ACTION_COL = 149
+WON_COL = 150
+NET_POINTS_COL = 151
+ROW_WIDTH = 152
+
+POLICIES = {"greedy": GreedyBot, "random": RandomBot}
+
+
+def action_index(tile: Domino, end: str) -> int:
+    return TILE_INDEX[tile] * 2 + (1 if end == "right" else 0)
+
+
+def hand_rows(hand: HandRecord, scores_before: list[int]) -> list[list[int]]:
+    """Re-walk a recorded hand and build one row per decision a bot made."""
+    hands = [sorted((Domino(a, b) for a, b in tiles), key=TILE_INDEX.get) for tiles in hand.starting_hands]
+    played_by = [0] * 28
+    voids = [set() for _ in range(4)]
+    layout = []
+    ends = None
+    passes = 0
+    rows = []
+    for m in hand.moves:
+        p = m.player
+        if m.end == "pass":
+            if ends is not None:
+                voids[p].update(ends)
+            passes += 1
+            continue
+
+        tile = Domino(m.tile_a, m.tile_b)
+        team = p % 2
+        row = [0] * ROW_WIDTH
+        for t in hands[p]:
+            row[TILE_INDEX[t]] = 1
+        for i, seat in enumerate(played_by):
+            if seat:
+                row[PLAYED_SLICE.start + i] = (seat - 1 - p) % 4 + 1
+        row[ENDS_SLICE.start:ENDS_SLICE.stop] = list(ends) if ends is not None else [-1, -1]
+        for rel in range(4):
+            seat = (p + rel) % 4
+            row[SIZES_SLICE.start + rel] = len(hands[seat])
+            for v in voids[seat]:
+                row[VOIDS_SLICE.start + rel * 7 + v] = 1
+        row[PASSES_COL] = passes
+        row[SCORES_SLICE.start] = scores_before[team]
+        row[SCORES_SLICE.start + 1] = scores_before[1 - team]
+        for t, end in legal_moves_for_hand(hands[p], ends):
+            row[LEGAL_SLICE.start + action_index(t, end)] = 1
+        row[ACTION_COL] = action_index(tile, m.end)
+        row[WON_COL] = 1 if hand.winner_team == team else 0
+        row[NET_POINTS_COL] = hand.points_earned[p] - hand.points_earned[(p + 1) % 4]
+        rows.append(row)
+
+        ends = place_tile(layout, ends, tile, m.end)
+        hands[p].remove(tile)
+        played_by[TILE_INDEX[tile]] = p + 1
+        passes = 0
+    return rows
+
+
+def write_npy(path: str, values: array, rows: int, cols: int) -> None:
+    """Write an int16 C-order matrix in .npy v1.0 format, atomically."""
+    header = f"{{'descr': '<i2', 'fortran_order': False, 'shape': ({rows}, {cols}), }}"
+    header += " " * (63 - (10 + len(header)) % 64) + "\n"
+    if sys.byteorder != "little":
+        values = array("h", values)
+        values.byteswap()
+    with atomic_write(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode("latin1"))
+        values.tofile(f)
+
+
+def read_npy_shape(path: str) -> tuple[int, int]:
+    with open(path, "rb") as f:
+        f.read(8)
+        (header_len,) = struct.unpack("<H", f.read(2))
+        return ast.literal_eval(f.read(header_len).decode("latin1"))["shape"]
+
+
+def shard_name(k: int) -> str:
+    return f"shard_{k:05d}.npy"
+
+
+def _generate_shard(args) -> int:
+    directory, k, shard_size, seed, policy_a, policy_b, target_points = args
+    random.seed(derive_seed(seed, k))
+    bot_a = POLICIES[policy_a]()
+    bot_b = POLICIES[policy_b]()
+    bots = [bot_a, bot_b, bot_a, bot_b]
+    config = MatchConfig(target_points=target_points, mode=GameMode.TEAMS)
+    values = array("h")
+    rows = 0
+    match_idx = 0
+    while rows < shard_size:
+        rec = run_single_match(bots, config, match_idx)
+        match_idx += 1
+        scores = [0, 0]
+        for hand in rec.hands:
+            for row in hand_rows(hand, scores):
+                if rows == shard_size:
+                    break
+                values.extend(row)
+                rows += 1
+            scores[0] += hand.points_earned[0]
+            scores[1] += hand.points_earned[1]
+    write_npy(os.path.join(directory, shard_name(k)), values, rows, ROW_WIDTH)
+    return k
+
+
+def _write_index(directory: str, meta: dict) -> None:
+    shards = sorted(
+        name for name in os.listdir(directory)
+        if name.startswith("shard_") and name.endswith(".npy")
+    )
+    index = {
+        **meta,
+        "row_width": ROW_WIDTH,
+        "dtype": "<i2",
+        "shards": [{"file": name, "rows": read_npy_shape(os.path.join(directory, name))[0]} for name in shards],
+    }
+    with atomic_write(os.path.join(directory, "index.json")) as f:
+        json.dump(index, f, indent=1)
+
+
+def generate_dataset(
+    directory: str,
+    num_shards: int,
+    shard_size: int = 65536,
+    seed: int = 0,
+    workers: Optional[int] = None,
+    policy_a: str = "greedy",
+    policy_b: str = "greedy",
+    target_points: int = 200,
+) -> None:
+    """Generate (or finish generating) num_shards shards into directory."""
+    os.makedirs(directory, exist_ok=True)
+    meta = {
+        "seed": seed,
+        "shard_size": shard_size,
+        "policy_a": policy_a,
+        "policy_b": policy_b,
+        "target_points": target_points,
+    }
+    index_path = os.path.join(directory, "index.json")
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            existing = json.load(f)
+        for key, value in meta.items():
+            if existing.get(key) != value:
+                raise ValueError(f"{directory} was generated with {key}={existing.get(key)!r}")
+
+    pending = [
+        (directory, k, shard_size, seed, policy_a, policy_b, target_points)
+        for k in range(num_shards)
+        if not os.path.exists(os.path.join(directory, shard_name(k)))
+    ]
+    print(f"{len(pending)} of {num_shards} shards to generate")
+    t0 = time.time()
+    with Pool(workers) as pool:
+        for n, k in enumerate(pool.imap_unordered(_generate_shard, pending), 1):
+            _write_index(directory, meta)
+            print(f"shard {k} done ({n}/{len(pending)}, {time.time() - t0:.0f}s)")
+    _write_index(directory, meta)
+
+
+def iter_batches(
+    directory: str,
+    batch_size: int = 1024,
+    seed: int = 0,
+    epochs: int = 1,
+    shards_in_flight: int = 8,
+):
+    """
+    Stream shuffled mini-batches as dicts of NumPy arrays.
+
+    Up to `shards_in_flight` shards are memory-mapped at a time, opened in
+    shuffled order, and every batch draws its rows at random across all of
+    them, so one batch mixes positions from many unrelated matches. Only one
+    batch at a time is read into RAM.
+    """
+    import numpy as np
+
+    with open(os.path.join(directory, "index.json")) as f:
+        index = json.load(f)
+    rng = np.random.default_rng(seed)
+    for _ in range(epochs):
+        pending = list(rng.permutation(len(index["shards"])))
+        # [memory-mapped rows, row order, rows already used] per open shard
+        open_shards = []
+        while True:
+            left = sum(len(order) - used for _, order, used in open_shards)
+            while pending and (len(open_shards) < shards_in_flight or left < batch_size):
+                data = np.load(os.path.join(directory, index["shards"][pending.pop()]["file"]), mmap_mode="r")
+                open_shards.append([data, rng.permutation(len(data)), 0])
+                left += len(data)
+            if left == 0:
+                break
+            remaining = np.array([len(order) - used for _, order, used in open_shards])
+            counts = rng.multivariate_hypergeometric(remaining, min(batch_size, left))
+            parts = []
+            for shard, count in zip(open_shards, counts):
+                if count:
+                    data, order, used = shard
+                    parts.append(data[np.sort(order[used:used + count])])
+                    shard[2] += count
+            open_shards = [s for s in open_shards if s[2] < len(s[1])]
+            batch = np.concatenate(parts)
+            batch = batch[rng.permutation(len(batch))]
+            yield {
+                "obs": batch[:, :OBS_WIDTH],
+                "legal": batch[:, LEGAL_SLICE].astype(bool),
+                "action": batch[:, ACTION_COL],
+                "won": batch[:, WON_COL],
+                "net_points": batch[:, NET_POINTS_COL],
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a sharded self-play dataset")
+    parser.add_argument("directory")
+    parser.add_argument("--shards", type=int, required=True)
+    parser.add_argument("--shard-size", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--policy-a", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--policy-b", choices=sorted(POLICIES), default="greedy")
+    parser.add_argument("--target-points", type=int, default=200)
+    args = parser.parse_args()
+    generate_dataset(
+        args.directory, args.shards, args.shard_size, args.seed, args.workers,
+        args.policy_a, args.policy_b, args.target_points,
+    )
@@ -0,0 +1,255 @@
+"""
+Sharded arena execution through a file-based work queue.
+
+A coordinator splits a seeded arena run into match-index ranges ("units")
+inside a directory every host can reach, e.g. an NFS mount:
+
+    job.json              run parameters
+    bot_a.py, bot_b.py    bot sources, so any host can load them
+    claims/unit_N.G       generation G of the claim on unit N, created with O_EXCL
+    results/unit_N.pkl    the unit's ArenaProgress, written by rename
+
+Workers on any host claim units, play them with per-match seeds and write
+partial aggregates back. merge() folds the partials into the result dict
+run_arena returns; with deterministic bots it matches run_arena with the
+same seed. While a unit runs its worker touches the claim every
+HEARTBEAT_SECONDS. With --reclaim-stale, a worker takes over a unit whose
+claim has gone that long untouched (its worker died) by creating the
+claim's next generation, which only one worker can do.
+
+    python -m bots.shard create /mnt/shared/run1 --bot-a a.py --bot-b b.py --matches 100000
+    python -m bots.shard work /mnt/shared/run1          # on every host, as often as wanted
+    python -m bots.shard merge /mnt/shared/run1 --output results.json
+"""
+import argparse
+import json
+import os
+import pickle
+import socket
+import threading
+import time
+from multiprocessing import Process
+from typing import Optional
+
+from bots.analytics import default_metrics
+from bots.arena import ArenaProgress, play_matches
+from bots.bot_loader import load_bot_from_source
+from fileutil import atomic_write
+
+HEARTBEAT_SECONDS = 10
+
+
+def _unit_name(k: int) -> str:
+    return f"unit_{k:05d}"
+
+
+def create_job(
+    directory: str,
+    bot_a_source: str,
+    bot_b_source: str,
+    num_matches: int,
+    target_points: int = 200,
+    seed: int = 0,
+    unit_size: int = 1000,
+    keep_matches: Optional[int] = 50,
+) -> dict:
+    os.makedirs(os.path.join(directory, "claims"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "results"), exist_ok=True)
+    if os.path.exists(os.path.join(directory, "job.json")):
+        raise ValueError(f"{directory} already holds a job")
+    for name, source in (("bot_a.py", bot_a_source), ("bot_b.py", bot_b_source)):
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(source)
+    units = [
+        [start, min(start + unit_size, num_matches)]
+        for start in range(0, num_matches, unit_size)
+    ]
+    job = {
+        "num_matches": num_matches,
+        "target_points": target_points,
+        "seed": seed,
+        "keep_matches": keep_matches,
+        "units": units,
+        "created_at": time.time(),
+    }
+    with atomic_write(os.path.join(directory, "job.json")) as f:
+        json.dump(job, f, indent=1)
+    return job
+
+
+def load_job(directory: str) -> dict:
+    with open(os.path.join(directory, "job.json")) as f:
+        return json.load(f)
+
+
+def _claim_path(directory: str, k: int, generation: int) -> str:
+    return os.path.join(directory, "claims", f"{_unit_name(k)}.{generation}")
+
+
+def _claim(directory: str, k: int, reclaim_stale: Optional[float]) -> Optional[str]:
+    """Claim unit k and return the claim's path, or None if it is taken or done."""
+    if os.path.exists(os.path.join(directory, "results", _unit_name(k) + ".pkl")):
+        return None
+    generation = 0
+    while os.path.exists(_claim_path(directory, k, generation)):
+        generation += 1
+    if generation > 0:
+        if reclaim_stale is None:
+            return None
+        try:
+            age = time.time() - os.path.getmtime(_claim_path(directory, k, generation - 1))
+        except FileNotFoundError:
+            return None
+        if age <= reclaim_stale:
+            return None
+    # O_EXCL lets exactly one worker create each generation, so two workers
+    # that both see the same stale claim cannot both take the unit over
+    path = _claim_path(directory, k, generation)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    with os.fdopen(fd, "w") as f:
+        f.write(f"{socket.gethostname()} {os.getpid()} {time.time()}\n")
+    return path
+
+
+def _heartbeat(claim_path: str, stop: threading.Event) -> None:
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            os.utime(claim_path)
+        except FileNotFoundError:
+            return
+
+
+def work(directory: str, max_units: Optional[int] = None, reclaim_stale: Optional[float] = None) -> int:
+    """Claim and run units until none are left; returns how many this worker ran."""
+    if reclaim_stale is not None and reclaim_stale < 3 * HEARTBEAT_SECONDS:
+        raise ValueError(f"reclaim_stale must be at least {3 * HEARTBEAT_SECONDS}s so live claims are not taken over")
+    job = load_job(directory)
+    bots = []
+    for name in ("bot_a", "bot_b"):
+        with open(os.path.join(directory, name + ".py")) as f:
+            bots.append(load_bot_from_source(f.read(), name))
+    bots_list = [bots[0], bots[1], bots[0], bots[1]]
+
+    done = 0
+    for k, (start, stop) in enumerate(job["units"]):
+        if max_units is not None and done >= max_units:
+            break
+        claim_path = _claim(directory, k, reclaim_stale)
+        if claim_path is None:
+            continue
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=_heartbeat, args=(claim_path, stop_heartbeat), daemon=True)
+        heartbeat.start()
+        try:
+            progress = ArenaProgress(
+                num_matches=job["num_matches"],
+                target_points=job["target_points"],
+                seed=job["seed"],
+                keep_matches=job["keep_matches"],
+                metrics=default_metrics(),
+            )
+            play_matches(progress, bots_list, range(start, stop))
+            progress.save(os.path.join(directory, "results", _unit_name(k) + ".pkl"))
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+        done += 1
+    return done
+
+
+def status(directory: str) -> dict:
+    job = load_job(directory)
+    results = os.listdir(os.path.join(directory, "results"))
+    claims = os.listdir(os.path.join(directory, "claims"))
+    finished = {_unit_name(k) for k in range(len(job["units"]))} & {r[:-4] for r in results if r.endswith(".pkl")}
+    claimed = {c.split(".")[0] for c in claims} - finished
+    return {
+        "units": len(job["units"]),
+        "finished": len(finished),
+        "in_progress": len(claimed),
+        "pending": len(job["units"]) - len(finished) - len(claimed),
+    }
+
+
+def merge(directory: str) -> dict:
+    """Combine every unit's partial aggregate into run_arena's result dict."""
+    job = load_job(directory)
+    missing = [
+        _unit_name(k) for k in range(len(job["units"]))
+        if not os.path.exists(os.path.join(directory, "results", _unit_name(k) + ".pkl"))
+    ]
+    if missing:
+        raise ValueError(f"{len(missing)} units are not finished yet, e.g. {missing[0]}")
+
+    total = None
+    last_finished = job["created_at"]
+    for k in range(len(job["units"])):
+        path = os.path.join(directory, "results", _unit_name(k) + ".pkl")
+        last_finished = max(last_finished, os.path.getmtime(path))
+        with open(path, "rb") as f:
+            part = pickle.load(f)
+        if total is None:
+            total = part
+        else:
+            total.merge(part)
+    # wall-clock time of the whole sharded run, not the sum over workers
+    total.elapsed = last_finished - job["created_at"]
+    return total.to_results()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded arena runs over a shared directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("create", help="split an arena run into work units")
+    p.add_argument("directory")
+    p.add_argument("--bot-a", required=True)
+    p.add_argument("--bot-b", required=True)
+    p.add_argument("--matches", type=int, required=True)
+    p.add_argument("--target-points", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--unit-size", type=int, default=1000)
+    p.add_argument("--keep-matches", type=int, default=50)
+
+    p = sub.add_parser("work", help="claim and run units")
+    p.add_argument("directory")
+    p.add_argument("--processes", type=int, default=1, help="local worker processes")
+    p.add_argument("--max-units", type=int, default=None)
+    p.add_argument("--reclaim-stale", type=float, default=None, metavar="SECONDS")
+
+    p = sub.add_parser("status")
+    p.add_argument("directory")
+
+    p = sub.add_parser("merge", help="combine finished units into arena results")
+    p.add_argument("directory")
+    p.add_argument("--output", default=None)
+
+    args = parser.parse_args()
+    if args.command == "create":
+        with open(args.bot_a) as fa, open(args.bot_b) as fb:
+            job = create_job(
+                args.directory, fa.read(), fb.read(), args.matches,
+                args.target_points, args.seed, args.unit_size, args.keep_matches,
+            )
+        print(f"{len(job['units'])} units written to {args.directory}")
+    elif args.command == "work":
+        workers = [
+            Process(target=work, args=(args.directory, args.max_units, args.reclaim_stale))
+            for _ in range(args.processes)
+        ]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+    elif args.command == "status":
+        print(json.dumps(status(args.directory)))
+    else:
+        results = merge(args.directory)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f)
+        else:
+            print(json.dumps({k: v for k, v in results.items() if k != "matches"}, indent=1))
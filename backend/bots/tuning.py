@@ -0,0 +1,247 @@
+"""
+SPSA parameter tuning for parametric bots.
+
+A tunable bot declares numeric constructor arguments in its `tunable`
+class attribute as name -> (low, high). Each iteration perturbs every
+parameter at once by a random ±c step, plays the two perturbed bots
+against a fixed opponent on the same seeded matches (common random
+numbers, so the difference mostly reflects the parameters), and steps
+along the estimated gradient. Only two fitness evaluations are needed per
+iteration however many parameters there are, and each evaluation's
+matches are split across a process pool.
+
+Fitness is the candidate team's average point margin per match, divided
+by the target points. Iteration k is seeded from seed and k alone, so a
+run resumes exactly from its JSON checkpoint; every iteration is appended
+to a JSONL convergence log.
+
+    python -m bots.tuning dominoes.bots:GreedyBot --iterations 100 --matches 200
+"""
+import argparse
+import importlib
+import json
+import os
+import time
+from multiprocessing import Pool
+from typing import Optional
+
+from dominoes.types import MatchConfig, GameMode
+from bots.arena import run_single_match, match_rng
+from fileutil import atomic_write
+
+
+def _play_chunk(args) -> tuple[int, int, int]:
+    """Play matches [start, stop) and return (point margin, wins, hands)."""
+    bot_class, params, opponent_class, opponent_params, target_points, seed, start, stop = args
+    bot = bot_class(**params)
+    opponent = opponent_class(**opponent_params)
+    bots = [bot, opponent, bot, opponent]
+    config = MatchConfig(target_points=target_points, mode=GameMode.TEAMS)
+    margin = wins = hands = 0
+    for i in range(start, stop):
+        rec = run_single_match(bots, config, i, match_rng(seed, i))
+        margin += rec.final_scores[0] - rec.final_scores[1]
+        wins += rec.winner_team == 0
+        hands += len(rec.hands)
+    return margin, wins, hands
+
+
+def _chunks(num_matches: int, num_chunks: int) -> list[tuple[int, int]]:
+    size = -(-num_matches // num_chunks)
+    return [(s, min(s + size, num_matches)) for s in range(0, num_matches, size)]
+
+
+class SPSATuner:
+    def __init__(
+        self,
+        bot_class,
+        opponent_class=None,
+        opponent_params: Optional[dict] = None,
+        matches_per_eval: int = 200,
+        target_points: int = 200,
+        a: float = 0.1,
+        c: float = 0.1,
+        seed: int = 0,
+        workers: Optional[int] = None,
+        checkpoint_path: Optional[str] = None,
+        log_path: Optional[str] = None,
+    ):
+        if not bot_class.tunable:
+            raise ValueError(f"{bot_class.__name__} declares no tunable parameters")
+        self.bot_class = bot_class
+        self.opponent_class = opponent_class or bot_class
+        self.opponent_params = opponent_params or {}
+        self.names = sorted(bot_class.tunable)
+        self.bounds = [bot_class.tunable[n] for n in self.names]
+        self.matches_per_eval = matches_per_eval
+        self.target_points = target_points
+        self.a = a
+        self.c = c
+        self.seed = seed
+        self.workers = workers or os.cpu_count() or 1
+        self.checkpoint_path = checkpoint_path
+        self.log_path = log_path
+
+        # theta lives in [0, 1] per parameter; start from the bot's defaults
+        defaults = bot_class().__dict__
+        self.theta = [
+            (defaults.get(n, (lo + hi) / 2) - lo) / (hi - lo)
+            for n, (lo, hi) in zip(self.names, self.bounds)
+        ]
+        self.iteration = 0
+        self.hands_simulated = 0
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as f:
+                state = json.load(f)
+            changed = [key for key, value in self._run_settings().items() if state.get(key) != value]
+            if changed:
+                raise ValueError(
+                    f"Checkpoint {checkpoint_path} belongs to a different tuning run ({', '.join(changed)} differ)"
+                )
+            self.theta = state["theta"]
+            self.iteration = state["iteration"]
+            self.hands_simulated = state["hands_simulated"]
+
+    def _run_settings(self) -> dict:
+        """Everything that defines the optimisation, as stored in the checkpoint."""
+        return {
+            "bot": f"{self.bot_class.__module__}:{self.bot_class.__qualname__}",
+            "names": self.names,
+            "opponent": f"{self.opponent_class.__module__}:{self.opponent_class.__qualname__}",
+            "opponent_params": self.opponent_params,
+            "matches_per_eval": self.matches_per_eval,
+            "target_points": self.target_points,
+            "a": self.a,
+            "c": self.c,
+            "seed": self.seed,
+        }
+
+    def params(self, theta: Optional[list[float]] = None) -> dict[str, float]:
+        theta = self.theta if theta is None else theta
+        return {
+            n: lo + min(max(t, 0.0), 1.0) * (hi - lo)
+            for n, t, (lo, hi) in zip(self.names, theta, self.bounds)
+        }
+
+    def _evaluate(self, pool, candidates: list[dict], seed: int) -> list[float]:
+        """Fitness of each parameter set on the same seeded matches."""
+        chunks = _chunks(self.matches_per_eval, self.workers)
+        tasks = [
+            (self.bot_class, params, self.opponent_class, self.opponent_params,
+             self.target_points, seed, start, stop)
+            for params in candidates
+            for start, stop in chunks
+        ]
+        results = pool.map(_play_chunk, tasks)
+        fitness = []
+        for i in range(len(candidates)):
+            part = results[i * len(chunks):(i + 1) * len(chunks)]
+            self.hands_simulated += sum(hands for _, _, hands in part)
+            margin = sum(m for m, _, _ in part)
+            fitness.append(margin / (self.matches_per_eval * self.target_points))
+        return fitness
+
+    def step(self, pool) -> dict:
+        k = self.iteration
+        rng = match_rng(self.seed, k)
+        a_k = self.a / (k + 1 + 10) ** 0.602
+        c_k = self.c / (k + 1) ** 0.101
+        delta = [rng.choice((-1.0, 1.0)) for _ in self.names]
+        plus = [t + c_k * d for t, d in zip(self.theta, delta)]
+        minus = [t - c_k * d for t, d in zip(self.theta, delta)]
+        f_plus, f_minus = self._evaluate(pool, [self.params(plus), self.params(minus)], rng.getrandbits(32))
+        gradient = [(f_plus - f_minus) / (2 * c_k * d) for d in delta]
+        # maximize fitness
+        self.theta = [min(max(t + a_k * g, 0.0), 1.0) for t, g in zip(self.theta, gradient)]
+        self.iteration += 1
+        return {
+            "iteration": self.iteration,
+            "params": self.params(),
+            "f_plus": round(f_plus, 5),
+            "f_minus": round(f_minus, 5),
+            "gradient": [round(g, 5) for g in gradient],
+            "hands_simulated": self.hands_simulated,
+        }
+
+    def _save(self) -> None:
+        state = {
+            **self._run_settings(),
+            "theta": self.theta,
+            "iteration": self.iteration,
+            "hands_simulated": self.hands_simulated,
+            "params": self.params(),
+        }
+        with atomic_write(self.checkpoint_path) as f:
+            json.dump(state, f, indent=1)
+
+    def run(self, iterations: int) -> dict:
+        """Run until `iterations` total iterations are done and return the tuned parameters."""
+        t0 = time.time()
+        with Pool(self.workers) as pool:
+            while self.iteration < iterations:
+                entry = self.step(pool)
+                entry["elapsed_seconds"] = round(time.time() - t0, 2)
+                if self.log_path is not None:
+                    with open(self.log_path, "a") as f:
+                        f.write(json.dumps(entry) + "\n")
+                if self.checkpoint_path is not None:
+                    self._save()
+                print(json.dumps(entry))
+        return {
+            "params": self.params(),
+            "iterations": self.iteration,
+            "hands_simulated": self.hands_simulated,
+        }
+
+
+def evaluate(bot_class, params: dict, opponent_class, opponent_params: dict,
+             num_matches: int = 1000, target_points: int = 200, seed: int = 0,
+             workers: Optional[int] = None) -> dict:
+    """Win rate and mean point margin of bot_class(**params) against the opponent."""
+    workers = workers or os.cpu_count() or 1
+    tasks = [
+        (bot_class, params, opponent_class, opponent_params, target_points, seed, start, stop)
+        for start, stop in _chunks(num_matches, workers)
+    ]
+    with Pool(workers) as pool:
+        results = pool.map(_play_chunk, tasks)
+    return {
+        "win_pct": round(sum(w for _, w, _ in results) / num_matches * 100, 1),
+        "avg_margin": round(sum(m for m, _, _ in results) / num_matches, 1),
+    }
+
+
+def _load_class(path: str):
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune a bot's parameters with SPSA")
+    parser.add_argument("bot", help="module:Class of the bot to tune, e.g. dominoes.bots:GreedyBot")
+    parser.add_argument("--opponent", help="module:Class of the opponent (defaults to the bot with its defaults)")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--matches", type=int, default=200, help="matches per fitness evaluation")
+    parser.add_argument("--target-points", type=int, default=200)
+    parser.add_argument("--a", type=float, default=0.1)
+    parser.add_argument("--c", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--log", default=None)
+    args = parser.parse_args()
+
+    bot_class = _load_class(args.bot)
+    tuner = SPSATuner(
+        bot_class,
+        opponent_class=_load_class(args.opponent) if args.opponent else None,
+        matches_per_eval=args.matches,
+        target_points=args.target_points,
+        a=args.a,
+        c=args.c,
+        seed=args.seed,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint,
+        log_path=args.log,
+    )
+    print(json.dumps(tuner.run(args.iterations)))
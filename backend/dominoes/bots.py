@@ -4,6 +4,9 @@ from .rules import legal_moves_for_hand
 
 
 class BotBase:
+    # Numeric constructor arguments that can be tuned, as name -> (low, high)
+    tunable: dict[str, tuple[float, float]] = {}
+
     def choose_move(
         self,
         hand: list[Domino],
@@ -11,8 +14,29 @@ class BotBase:
     ) -> Optional[tuple[Domino, str]]:
         raise NotImplementedError
 
+    def choose_moves_batch(
+        self,
+        positions: list[tuple[list[Domino], Optional[tuple[int, int]]]],
+    ) -> list[Optional[tuple[Domino, str]]]:
+        """
+        Decide several independent (hand, ends) positions in one call.
+
+        Bots backed by vectorized models should override this; the default
+        simply asks choose_move for each position in turn.
+        """
+        return [self.choose_move(hand, ends) for hand, ends in positions]
+
+
+def supports_batching(bot: BotBase) -> bool:
+    return type(bot).choose_moves_batch is not BotBase.choose_moves_batch
+
 
 class GreedyBot(BotBase):
+    tunable = {"double_penalty": (-10.0, 10.0)}
+
+    def __init__(self, double_penalty: float = -0.5):
+        self.double_penalty = double_penalty
+
     def choose_move(self, hand: list[Domino], ends):
         legal = legal_moves_for_hand(hand, ends)
         if not legal:
@@ -22,7 +46,7 @@ class GreedyBot(BotBase):
             tile, end = move
             s = tile.pips()
             if tile.is_double():
-                s -= 0.5
+                s += self.double_penalty
             return s
 
         return max(legal, key=score)
@@ -0,0 +1,28 @@
+"""
+Cached wire encodings for tiles.
+
+Every orientation of every tile is encoded once at import, both as the
+{"a": .., "b": ..} object the frontend reads and as the compact [a, b]
+array form. Encoders hand out these shared objects, so callers must treat
+them as read-only.
+"""
+from typing import Iterable
+from .types import Domino
+
+_OBJECTS = [{"a": a, "b": b} for a in range(7) for b in range(7)]
+_ARRAYS = [[a, b] for a in range(7) for b in range(7)]
+
+
+def encode_tile(tile: Domino, compact: bool = False):
+    i = tile.a * 7 + tile.b
+    return _ARRAYS[i] if compact else _OBJECTS[i]
+
+
+def encode_tiles(tiles: Iterable[Domino], compact: bool = False) -> list:
+    table = _ARRAYS if compact else _OBJECTS
+    return [table[t.a * 7 + t.b] for t in tiles]
+
+
+def encode_pair(a: int, b: int):
+    """Array form of a raw (a, b) pair, e.g. from arena records."""
+    return _ARRAYS[a * 7 + b] if a >= 0 else [a, b]
@@ -3,8 +3,9 @@ from typing import Optional
 import random
 from .types import Domino, MatchConfig, PlayerState, GameMode
 from .tiles import generate_double_six_set
-from .rules import legal_moves_for_hand
+from .rules import legal_moves_for_hand, place_tile
 from .scoring import compute_hand_scores_ffa, compute_hand_scores_teams
+from .encoding import encode_tiles
 from . import bots
 
 
@@ -49,34 +50,7 @@ class MatchState:
         hs = self.hand_state
         assert hs is not None
         hs.ends_before_last_move = hs.ends
-        if hs.ends is None:
-            hs.layout.append(tile)
-            hs.ends = (tile.a, tile.b)
-        else:
-            left, right = hs.ends
-            if end == "left":
-                if tile.a == left:
-                    hs.layout.insert(0, Domino(tile.b, tile.a))
-                    hs.ends = (tile.b, right)
-                elif tile.b == left:
-                    hs.layout.insert(0, tile)
-                    hs.ends = (tile.a, right)
-                else:
-                    raise ValueError("Illegal move on left")
-            elif end == "right":
-                if tile.a == right:
-                    hs.layout.append(tile)
-                    hs.ends = (left, tile.b)
-                elif tile.b == right:
-                    hs.layout.append(Domino(tile.b, tile.a))
-                    hs.ends = (left, tile.a)
-                else:
-                    raise ValueError("Illegal move on right")
-            elif end == "start":
-                hs.layout.append(tile)
-                hs.ends = (tile.a, tile.b)
-            else:
-                raise ValueError("Invalid end")
+        hs.ends = place_tile(hs.layout, hs.ends, tile, end)
         hs.passes_in_a_row = 0
         hs.winning_tile = tile
         player = self.players[player_index]
@@ -110,7 +84,7 @@ class MatchState:
         blocked = self.is_blocked()
         hands_pips = [p.hand_pips() for p in self.players]
         remaining = [
-            {"index": p.index, "hand": [{"a": t.a, "b": t.b} for t in p.hand], "pips": p.hand_pips()}
+            {"index": p.index, "hand": list(p.hand), "pips": p.hand_pips()}
             for p in self.players
         ]
 
@@ -156,7 +130,8 @@ class MatchState:
         team1_score = self.players[1].score
         return team0_score >= self.config.target_points or team1_score >= self.config.target_points
 
-    def to_dict(self) -> dict:
+    def to_dict(self, compact: bool = False) -> dict:
+        """JSON-ready state; compact encodes tiles as [a, b] instead of {"a", "b"}."""
         hs = self.hand_state
         layout = hs.layout if hs is not None else []
         ends = hs.ends if hs is not None else None
@@ -174,17 +149,29 @@ class MatchState:
                 {
                     "index": p.index,
                     "score": p.score,
-                    "hand": [{"a": t.a, "b": t.b} for t in p.hand],
+                    "hand": encode_tiles(p.hand, compact),
                 }
                 for p in self.players
             ],
             "hand_state": {
-                "layout": [{"a": t.a, "b": t.b} for t in layout],
+                "layout": encode_tiles(layout, compact),
                 "ends": {"left": ends[0], "right": ends[1]} if ends is not None else None,
                 "current_player": current_player,
                 "passes_in_a_row": passes,
                 "last_move_blocked": last_blocked,
             },
-            "last_hand_result": self.last_hand_result,
+            "last_hand_result": self._hand_result_dict(compact),
             "match_over": self.is_match_over(),
         }
+
+    def _hand_result_dict(self, compact: bool) -> Optional[dict]:
+        result = self.last_hand_result
+        if result is None:
+            return None
+        return {
+            **result,
+            "remaining": [
+                {**r, "hand": encode_tiles(r["hand"], compact)}
+                for r in result["remaining"]
+            ],
+        }
@@ -0,0 +1,148 @@
+"""
+Tile-location inference for imperfect-information bots.
+
+A TileTracker follows one seat's view of a hand: its own tiles, the tiles
+played so far, every opponent's hand size and the pips each opponent is
+known to lack (a player who passes on ends (3, 5) holds no 3s or 5s).
+Observations are O(1). Treating every deal consistent with them as equally
+likely, posterior() gives the exact probability that each opponent holds
+each unseen tile, and sample_deal() draws consistent deals uniformly for
+Monte Carlo bots. Both count deals with a dynamic program over the unseen
+tiles whose state is how many tiles each opponent has been given so far.
+"""
+import random
+from typing import Optional
+
+from .types import Domino
+from .tiles import generate_double_six_set
+from .rules import place_tile
+
+_TILES = generate_double_six_set()
+
+
+class TileTracker:
+    def __init__(self, seat: int, hand: list[Domino]):
+        self.seat = seat
+        self.hand = set(hand)
+        self.played: set[Domino] = set()
+        self.hand_sizes = [7, 7, 7, 7]
+        self.voids: list[set[int]] = [set() for _ in range(4)]
+        self.opponents = [p for p in range(4) if p != seat]
+        self._ways = None
+
+    @classmethod
+    def from_moves(cls, seat: int, hand: list[Domino], moves: list[dict]) -> "TileTracker":
+        """Build a tracker from recorded moves ({"player", "tile", "end"} dicts)."""
+        tracker = cls(seat, hand)
+        layout = []
+        ends = None
+        for move in moves:
+            if move["end"] == "pass":
+                tracker.observe_pass(move["player"], ends)
+            else:
+                tile = Domino(*move["tile"])
+                ends = place_tile(layout, ends, tile, move["end"])
+                tracker.observe_play(move["player"], tile)
+        return tracker
+
+    def observe_play(self, player: int, tile: Domino) -> None:
+        tile = _canonical(tile)
+        self.played.add(tile)
+        self.hand_sizes[player] -= 1
+        if player == self.seat:
+            self.hand.discard(tile)
+        self._ways = None
+
+    def observe_pass(self, player: int, ends: Optional[tuple[int, int]]) -> None:
+        if player == self.seat or ends is None:
+            return
+        new = set(ends) - self.voids[player]
+        if new:
+            self.voids[player] |= new
+            self._ways = None
+
+    def unseen(self) -> list[Domino]:
+        return [t for t in _TILES if t not in self.hand and t not in self.played]
+
+    def candidates(self, tile: Domino) -> list[int]:
+        """Opponents who could still hold the tile."""
+        return [p for p in self.opponents if tile.a not in self.voids[p] and tile.b not in self.voids[p]]
+
+    def _count(self):
+        """Backward table: ways[i][(c0, c1)] deals of tiles i.. given counts so far."""
+        if self._ways is not None:
+            return self._ways
+        tiles = self.unseen()
+        allowed = [[k for k, p in enumerate(self.opponents) if p in self.candidates(t)] for t in tiles]
+        sizes = [self.hand_sizes[p] for p in self.opponents]
+        n = len(tiles)
+        ways = [dict() for _ in range(n + 1)]
+        ways[n][(sizes[0], sizes[1])] = 1
+        for i in range(n - 1, -1, -1):
+            for c0 in range(min(i, sizes[0]) + 1):
+                for c1 in range(min(i - c0, sizes[1]) + 1):
+                    c2 = i - c0 - c1
+                    if c2 > sizes[2]:
+                        continue
+                    total = 0
+                    for k in allowed[i]:
+                        # over-full counts never reach the final state, so they have no entry
+                        total += ways[i + 1].get((c0 + (k == 0), c1 + (k == 1)), 0)
+                    if total:
+                        ways[i][(c0, c1)] = total
+        self._ways = (tiles, allowed, ways)
+        return self._ways
+
+    def num_consistent_deals(self) -> int:
+        tiles, allowed, ways = self._count()
+        return ways[0].get((0, 0), 0)
+
+    def posterior(self) -> dict[Domino, list[float]]:
+        """P(seat holds tile) for every unseen tile, indexed by seat (own seat is 0)."""
+        tiles, allowed, ways = self._count()
+        total = ways[0].get((0, 0), 0)
+        if total == 0:
+            raise ValueError("Observations are inconsistent with any deal")
+        forward = {(0, 0): 1}
+        probs = {}
+        for i, tile in enumerate(tiles):
+            counts = [0, 0, 0]
+            nxt_forward = {}
+            for (c0, c1), f in forward.items():
+                for k in allowed[i]:
+                    nxt = (c0 + (k == 0), c1 + (k == 1))
+                    b = ways[i + 1].get(nxt, 0)
+                    if b:
+                        counts[k] += f * b
+                        nxt_forward[nxt] = nxt_forward.get(nxt, 0) + f
+            forward = nxt_forward
+            row = [0.0] * 4
+            for k, p in enumerate(self.opponents):
+                row[p] = counts[k] / total
+            probs[tile] = row
+        return probs
+
+    def sample_deal(self, rng: Optional[random.Random] = None) -> list[list[Domino]]:
+        """Draw opponents' hands uniformly from all consistent deals; own hand is included as is."""
+        rng = rng or random
+        tiles, allowed, ways = self._count()
+        if not ways[0].get((0, 0)):
+            raise ValueError("Observations are inconsistent with any deal")
+        hands = [[] for _ in range(4)]
+        hands[self.seat] = sorted(self.hand, key=lambda t: (t.a, t.b))
+        c0 = c1 = 0
+        for i, tile in enumerate(tiles):
+            r = rng.randrange(ways[i][(c0, c1)])
+            for k in allowed[i]:
+                nxt = (c0 + (k == 0), c1 + (k == 1))
+                w = ways[i + 1].get(nxt, 0)
+                if r < w:
+                    hands[self.opponents[k]].append(tile)
+                    c0, c1 = nxt
+                    break
+                r -= w
+        return hands
+
+
+def _canonical(tile: Domino) -> Domino:
+    return tile if tile.a <= tile.b else Domino(tile.b, tile.a)
@@ -14,3 +14,36 @@ def legal_moves_for_hand(hand: list[Domino], ends: Optional[tuple[int, int]]) ->
         if a == right or b == right:
             legal.append((tile, "right"))
     return legal
+
+
+def place_tile(
+    layout: list[Domino],
+    ends: Optional[tuple[int, int]],
+    tile: Domino,
+    end: str,
+) -> tuple[int, int]:
+    """Add tile to the layout in place, oriented to match, and return the new ends."""
+    if ends is None:
+        layout.append(tile)
+        return (tile.a, tile.b)
+    left, right = ends
+    if end == "left":
+        if tile.a == left:
+            layout.insert(0, Domino(tile.b, tile.a))
+            return (tile.b, right)
+        if tile.b == left:
+            layout.insert(0, tile)
+            return (tile.a, right)
+        raise ValueError("Illegal move on left")
+    if end == "right":
+        if tile.a == right:
+            layout.append(tile)
+            return (left, tile.b)
+        if tile.b == right:
+            layout.append(Domino(tile.b, tile.a))
+            return (left, tile.a)
+        raise ValueError("Illegal move on right")
+    if end == "start":
+        layout.append(tile)
+        return (tile.a, tile.b)
+    raise ValueError("Invalid end")
@@ -8,6 +8,13 @@ def is_capicu(ends_before, ends_after) -> bool:
     return left_after == right_after
 
 
+def winning_team(hands_pips: list[int], winner_index: int, blocked: bool) -> int:
+    """Team (0 or 1) credited with a teams-mode hand."""
+    if blocked:
+        return 0 if hands_pips[0] + hands_pips[2] < hands_pips[1] + hands_pips[3] else 1
+    return winner_index % 2
+
+
 def compute_hand_scores_ffa(
     config: MatchConfig,
     hands_pips: list[int],
@@ -46,15 +53,14 @@ def compute_hand_scores_teams(
     scores = {i: 0 for i in range(4)}
     team0 = [0, 2]
     team1 = [1, 3]
-    team_for_player = 0 if winner_index in team0 else 1
+    team_for_player = winning_team(hands_pips, winner_index, blocked)
     team0_pips = hands_pips[0] + hands_pips[2]
     team1_pips = hands_pips[1] + hands_pips[3]
     total_pips = sum(hands_pips)
     if blocked:
-        winner_team = 0 if team0_pips < team1_pips else 1
-        winner_pips = team0_pips if winner_team == 0 else team1_pips
+        winner_pips = team0_pips if team_for_player == 0 else team1_pips
         base_points = total_pips - winner_pips
-        if winner_team == 0:
+        if team_for_player == 0:
             for i in team0:
                 scores[i] += base_points
         else:
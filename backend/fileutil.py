@@ -0,0 +1,24 @@
+"""
+Filesystem helpers shared by the stores, checkpoints and datasets.
+"""
+import os
+from contextlib import contextmanager
+from uuid import uuid4
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = "w"):
+    """
+    Yield a file to write `path`'s new contents to. The file is renamed over
+    `path` only if the block finishes, so readers in any process never see
+    a partial file, and an error leaves the old contents in place.
+    """
+    tmp_path = f"{path}.{uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
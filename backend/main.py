@@ -1,10 +1,25 @@
+import os
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager, ExitStack
+from functools import lru_cache
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Literal
+from typing import Literal, Optional
 from dominoes.types import MatchConfig, GameMode
 from dominoes.game import MatchState
-from session_store import create_match, get_match, save_match
+from responses import FastJSONResponse
+from session_store import (
+    create_match,
+    read_match,
+    save_match,
+    locked_match,
+    StaleVersionError,
+)
+
+
+TileFormat = Literal["object", "array"]
 
 
 class StartMatchRequest(BaseModel):
@@ -15,13 +30,25 @@ class StartMatchRequest(BaseModel):
 class PlayMoveRequest(BaseModel):
     tile_index: int
     end: Literal["left", "right", "start"]
+    version: Optional[int] = None
 
 
 class PassRequest(BaseModel):
-    pass
+    version: Optional[int] = None
+
+
+class NextHandRequest(BaseModel):
+    version: Optional[int] = None
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from bots.registry import get_registry
+    get_registry().preload()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -56,149 +83,285 @@ def run_bots(match: MatchState):
         match.next_player()
 
 
+def state_response(game_id: str, version: int, match: MatchState, tiles: TileFormat) -> FastJSONResponse:
+    state = match.to_dict(compact=tiles == "array")
+    return FastJSONResponse({"gameId": game_id, "version": version, "state": state})
+
+
 @app.post("/api/match")
-def start_match(req: StartMatchRequest):
+def start_match(req: StartMatchRequest, tiles: TileFormat = "object"):
     mode = GameMode.FFA if req.mode == "ffa" else GameMode.TEAMS
     config = MatchConfig(target_points=req.target_points, mode=mode)
     match = MatchState.new_with_default_bots(config)
     match.start_new_hand()
     run_bots(match)
     game_id = create_match(match)
-    return {"gameId": game_id, "state": match.to_dict()}
+    return state_response(game_id, 0, match, tiles)
 
 
 @app.get("/api/match/{game_id}")
-def get_state(game_id: str):
-    try:
-        match = get_match(game_id)
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Match not found")
-    return {"gameId": game_id, "state": match.to_dict()}
+def get_state(game_id: str, tiles: TileFormat = "object"):
+    with ExitStack() as stack:
+        try:
+            match, version = stack.enter_context(read_match(game_id))
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Match not found")
+        return state_response(game_id, version, match, tiles)
+
+
+@contextmanager
+def match_for_update(game_id: str, version: Optional[int]):
+    with ExitStack() as stack:
+        # only the lookup maps to 404/409; errors from the endpoint body pass through
+        try:
+            match, current = stack.enter_context(locked_match(game_id, expected_version=version))
+        except KeyError:
+            raise HTTPException(status_code=404, detail="Match not found")
+        except StaleVersionError as e:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Stale move: match is at version {e.current_version}",
+            )
+        yield match, current
 
 
 @app.post("/api/match/{game_id}/play")
-def play_move(game_id: str, req: PlayMoveRequest):
-    try:
-        match = get_match(game_id)
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Match not found")
-    hs = match.hand_state
-    if hs is None:
-        raise HTTPException(status_code=400, detail="No active hand")
-    if hs.current_player != 0:
-        raise HTTPException(status_code=400, detail="Not human turn")
-    player = match.players[0]
-    if not (0 <= req.tile_index < len(player.hand)):
-        raise HTTPException(status_code=400, detail="Invalid tile index")
-    tile = player.hand[req.tile_index]
-    if req.end != "start" and hs.ends is not None:
-        left, right = hs.ends
-        if req.end == "left" and tile.a != left and tile.b != left:
-            raise HTTPException(status_code=400, detail=f"Tile {tile.a}|{tile.b} cannot play on left end {left}")
-        if req.end == "right" and tile.a != right and tile.b != right:
-            raise HTTPException(status_code=400, detail=f"Tile {tile.a}|{tile.b} cannot play on right end {right}")
+def play_move(game_id: str, req: PlayMoveRequest, tiles: TileFormat = "object"):
+    with match_for_update(game_id, req.version) as (match, version):
+        hs = match.hand_state
+        if hs is None:
+            raise HTTPException(status_code=400, detail="No active hand")
+        if hs.current_player != 0:
+            raise HTTPException(status_code=400, detail="Not human turn")
+        player = match.players[0]
+        if not (0 <= req.tile_index < len(player.hand)):
+            raise HTTPException(status_code=400, detail="Invalid tile index")
+        tile = player.hand[req.tile_index]
+        if req.end != "start" and hs.ends is not None:
+            left, right = hs.ends
+            if req.end == "left" and tile.a != left and tile.b != left:
+                raise HTTPException(status_code=400, detail=f"Tile {tile.a}|{tile.b} cannot play on left end {left}")
+            if req.end == "right" and tile.a != right and tile.b != right:
+                raise HTTPException(status_code=400, detail=f"Tile {tile.a}|{tile.b} cannot play on right end {right}")
+
+        try:
+            match.play_tile(0, tile, req.end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        match.next_player()
+        run_bots(match)
+        version = save_match(game_id, match, version)
+        return state_response(game_id, version, match, tiles)
+
 
+@app.post("/api/match/{game_id}/pass")
+def pass_turn(game_id: str, req: Optional[PassRequest] = None, tiles: TileFormat = "object"):
+    from dominoes.rules import legal_moves_for_hand
+    with match_for_update(game_id, req.version if req else None) as (match, version):
+        hs = match.hand_state
+        if hs is None:
+            raise HTTPException(status_code=400, detail="No active hand")
+        if hs.current_player != 0:
+            raise HTTPException(status_code=400, detail="Not human turn")
+        player = match.players[0]
+        legal = legal_moves_for_hand(player.hand, hs.ends)
+        if legal:
+            raise HTTPException(status_code=400, detail="You have legal moves and cannot pass")
+        match.pass_turn()
+        match.next_player()
+        run_bots(match)
+        version = save_match(game_id, match, version)
+        return state_response(game_id, version, match, tiles)
+
+
+@app.post("/api/match/{game_id}/next_hand")
+def next_hand(game_id: str, req: Optional[NextHandRequest] = None, tiles: TileFormat = "object"):
+    with match_for_update(game_id, req.version if req else None) as (match, version):
+        if match.is_match_over():
+            raise HTTPException(status_code=400, detail="Match is over")
+        if match.last_hand_result is None:
+            raise HTTPException(status_code=400, detail="No hand result to continue from")
+        match.start_new_hand()
+        run_bots(match)
+        version = save_match(game_id, match, version)
+        return state_response(game_id, version, match, tiles)
+
+
+@app.get("/api/equity")
+def get_hand_equity(hand: str, seat: int = 0):
+    from bots.equity import get_table, parse_hand
+    table = get_table()
+    if table is None:
+        raise HTTPException(status_code=503, detail="Equity table has not been built")
+    if not (0 <= seat < 4):
+        raise HTTPException(status_code=400, detail="Seat must be between 0 and 3")
     try:
-        match.play_tile(0, tile, req.end)
+        tiles = parse_hand(hand)
+        result = table.lookup(tiles, seat)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
-    match.next_player()
-    run_bots(match)
-    save_match(game_id, match)
-    return {"gameId": game_id, "state": match.to_dict()}
+    if result is None:
+        raise HTTPException(status_code=404, detail="Hand has not been evaluated yet")
+    win_probability, expected_points = result
+    return {
+        "hand": [{"a": t.a, "b": t.b} for t in tiles],
+        "seat": seat,
+        "win_probability": round(win_probability, 4),
+        "expected_points": round(expected_points, 2),
+        "samples": table.samples,
+    }
+
+
+@app.post("/api/bots")
+async def register_bot(file: UploadFile = File(...), name: Optional[str] = Form(default=None)):
+    from bots.registry import get_registry
+    try:
+        src = (await file.read()).decode("utf-8")
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        raise HTTPException(status_code=400, detail="Could not read uploaded file")
+    name = name or os.path.splitext(file.filename or "bot")[0]
+    try:
+        entry = get_registry().register(name, src)
+    except Exception as e:
+        print(f"Bot validation failed: {e}")
+        raise HTTPException(status_code=400, detail=f"Bot validation failed: {str(e)}")
+    return entry
 
 
-@app.post("/api/match/{game_id}/pass")
-def pass_turn(game_id: str):
-    from dominoes.rules import legal_moves_for_hand
-    try:
-        match = get_match(game_id)
-    except KeyError:
-        raise HTTPException(status_code=404, detail="Match not found")
-    hs = match.hand_state
-    if hs is None:
-        raise HTTPException(status_code=400, detail="No active hand")
-    if hs.current_player != 0:
-        raise HTTPException(status_code=400, detail="Not human turn")
-    player = match.players[0]
-    legal = legal_moves_for_hand(player.hand, hs.ends)
-    if legal:
-        raise HTTPException(status_code=400, detail="You have legal moves and cannot pass")
-    match.pass_turn()
-    match.next_player()
-    run_bots(match)
-    save_match(game_id, match)
-    return {"gameId": game_id, "state": match.to_dict()}
+@app.get("/api/bots")
+def list_bots():
+    from bots.registry import get_registry
+    return get_registry().list_entries()
 
 
-@app.post("/api/match/{game_id}/next_hand")
-def next_hand(game_id: str):
+@app.get("/api/bots/{bot_id}")
+def get_bot(bot_id: str):
+    from bots.registry import get_registry
     try:
-        match = get_match(game_id)
+        return get_registry().get_entry(bot_id)
     except KeyError:
-        raise HTTPException(status_code=404, detail="Match not found")
-    if match.is_match_over():
-        raise HTTPException(status_code=400, detail="Match is over")
-    if match.last_hand_result is None:
-        raise HTTPException(status_code=400, detail="No hand result to continue from")
-    match.start_new_hand()
-    run_bots(match)
-    save_match(game_id, match)
-    return {"gameId": game_id, "state": match.to_dict()}
+        raise HTTPException(status_code=404, detail="Bot not found")
 
 
 _arena_results = {}
-
-@app.post("/api/arena/run")
-async def run_arena_endpoint(
-    bot_a: UploadFile = File(...),
-    bot_b: UploadFile = File(...),
-    num_matches: int = Form(default=1000),
-    target_points: int = Form(default=200),
-):
+MAX_ARENA_MATCHES = 5000
+# resumable runs checkpoint as they go, so they may be far longer
+MAX_CHECKPOINTED_ARENA_MATCHES = 1_000_000
+ARENA_CHECKPOINT_DIR = os.environ.get("DOMINOES_ARENA_CHECKPOINTS", "arena_checkpoints")
+
+async def resolve_arena_bot(upload: Optional[UploadFile], bot_id: Optional[str], label: str, slot: str):
+    """
+    Bot instance, display name, registry id (None for uploads) and source
+    hash for one arena side.
+    """
+    import hashlib
     from bots.bot_loader import load_bot_from_source
-    from bots.arena import run_arena
-    from uuid import uuid4
-
+    from bots.registry import get_registry
+
+    if bot_id:
+        registry = get_registry()
+        try:
+            entry = registry.get_entry(bot_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"{label} is not in the bot registry")
+        return registry.get_bot(bot_id), f"{entry['name']} v{entry['version']}", bot_id, entry["sha256"]
+
+    if upload is None:
+        raise HTTPException(status_code=400, detail=f"{label} needs an uploaded file or a registry id")
     try:
-        src_a = (await bot_a.read()).decode("utf-8")
-        src_b = (await bot_b.read()).decode("utf-8")
+        src = (await upload.read()).decode("utf-8")
     except Exception as e:
         print(f"Error reading files: {e}")
         raise HTTPException(status_code=400, detail="Could not read uploaded files")
 
     try:
-        bot_a_inst = load_bot_from_source(src_a, "bot_a")
+        bot = load_bot_from_source(src, slot)
     except Exception as e:
-        print(f"Error loading Bot A: {e}")
-        raise HTTPException(status_code=400, detail=f"Error loading Bot A: {str(e)}")
+        print(f"Error loading {label}: {e}")
+        raise HTTPException(status_code=400, detail=f"Error loading {label}: {str(e)}")
+    return bot, upload.filename or label, None, hashlib.sha256(src.encode("utf-8")).hexdigest()
 
-    try:
-        bot_b_inst = load_bot_from_source(src_b, "bot_b")
-    except Exception as e:
-        print(f"Error loading Bot B: {e}")
-        raise HTTPException(status_code=400, detail=f"Error loading Bot B: {str(e)}")
 
-    num_matches = min(num_matches, 5000)
+@app.post("/api/arena/run")
+async def run_arena_endpoint(
+    bot_a: Optional[UploadFile] = File(default=None),
+    bot_b: Optional[UploadFile] = File(default=None),
+    bot_a_id: Optional[str] = Form(default=None),
+    bot_b_id: Optional[str] = Form(default=None),
+    num_matches: int = Form(default=1000),
+    target_points: int = Form(default=200),
+    run_id: Optional[str] = Form(default=None),
+    seed: Optional[int] = Form(default=None),
+):
+    from bots.arena import run_arena, CheckpointMismatchError, IllegalMoveError
+    from bots.registry import get_registry
+    from dominoes.bots import supports_batching
+    from uuid import uuid4
+
+    bot_a_inst, bot_a_name, bot_a_id, bot_a_sha = await resolve_arena_bot(bot_a, bot_a_id, "Bot A", "bot_a")
+    bot_b_inst, bot_b_name, bot_b_id, bot_b_sha = await resolve_arena_bot(bot_b, bot_b_id, "Bot B", "bot_b")
+
+    num_matches = min(num_matches, MAX_CHECKPOINTED_ARENA_MATCHES if run_id is not None else MAX_ARENA_MATCHES)
     target_points = max(50, min(target_points, 1000))
 
+    # A run_id makes the run resumable: progress is checkpointed under that
+    # id, and posting the same run with the same bots continues where it
+    # stopped. Bots that draw from the global random module (RandomBot)
+    # make a resumed run differ from an uninterrupted one.
+    checkpoint_path = None
+    if run_id is not None:
+        if not re.fullmatch(r"[A-Za-z0-9_-]{1,64}", run_id):
+            raise HTTPException(status_code=400, detail="run_id may only contain letters, digits, _ and -")
+        os.makedirs(ARENA_CHECKPOINT_DIR, exist_ok=True)
+        checkpoint_path = os.path.join(ARENA_CHECKPOINT_DIR, run_id + ".pkl")
+
     try:
         results = run_arena(
             bot_a=bot_a_inst,
             bot_b=bot_b_inst,
             num_matches=num_matches,
             target_points=target_points,
+            concurrency=64 if supports_batching(bot_a_inst) or supports_batching(bot_b_inst) else 1,
+            keep_matches=50,
+            seed=seed,
+            checkpoint_path=checkpoint_path,
+            bots_fingerprint=f"{bot_a_sha}:{bot_b_sha}",
         )
+    except CheckpointMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except IllegalMoveError as e:
+        label = bot_a_name if e.seat % 2 == 0 else bot_b_name
+        raise HTTPException(status_code=400, detail=f"{label}: {str(e)}")
     except Exception as e:
         print(f"Arena execution error: {e}")
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Arena error: {str(e)}")
 
-    arena_id = str(uuid4())
+    arena_id = run_id or str(uuid4())
     results["arena_id"] = arena_id
-    results["bot_a_name"] = bot_a.filename or "Bot A"
-    results["bot_b_name"] = bot_b.filename or "Bot B"
+    results["bot_a_name"] = bot_a_name
+    results["bot_b_name"] = bot_b_name
+    results["bot_a_id"] = bot_a_id
+    results["bot_b_id"] = bot_b_id
+
+    # a finished checkpoint replays its stored results; they were recorded then
+    already_recorded = results.get("resumed_from_match", 0) >= num_matches
+    for bot_id, own, opponent, side in (
+        (bot_a_id, bot_a_name, bot_b_name, "a"),
+        (bot_b_id, bot_b_name, bot_a_name, "b"),
+    ):
+        if bot_id is not None and not already_recorded:
+            get_registry().record_result(bot_id, {
+                "arena_id": arena_id,
+                "opponent": opponent,
+                "opponent_id": bot_b_id if side == "a" else bot_a_id,
+                "num_matches": num_matches,
+                "target_points": target_points,
+                "win_pct": results[f"team_{side}_win_pct"],
+                "recorded_at": time.time(),
+            })
 
     stored = {**results}
     stored["matches"] = results["matches"][:50]
@@ -207,14 +370,14 @@ async def run_arena_endpoint(
 
     summary = {k: v for k, v in results.items() if k != "matches"}
     summary["matches_stored"] = min(50, num_matches)
-    return summary
+    return FastJSONResponse(summary)
 
 
 @app.get("/api/arena/{arena_id}")
 def get_arena_results(arena_id: str):
     if arena_id not in _arena_results:
         raise HTTPException(status_code=404, detail="Arena results not found")
-    return _arena_results[arena_id]
+    return FastJSONResponse(_arena_results[arena_id])
 
 
 @app.get("/api/arena/{arena_id}/match/{match_idx}")
@@ -224,4 +387,30 @@ def get_arena_match(arena_id: str, match_idx: int):
     results = _arena_results[arena_id]
     if match_idx < 0 or match_idx >= len(results["matches"]):
         raise HTTPException(status_code=404, detail="Match not found")
-    return results["matches"][match_idx]
+    return FastJSONResponse(results["matches"][match_idx])
+
+
+@lru_cache(maxsize=256)
+def _hand_replay(arena_id: str, match_idx: int, hand_idx: int):
+    from bots.replay import HandReplay
+    return HandReplay(_arena_results[arena_id]["matches"][match_idx]["hands"][hand_idx])
+
+
+@app.get("/api/arena/{arena_id}/match/{match_idx}/hand/{hand_idx}/state")
+def get_arena_hand_state(arena_id: str, match_idx: int, hand_idx: int, move: Optional[int] = None):
+    if arena_id not in _arena_results:
+        raise HTTPException(status_code=404, detail="Arena results not found")
+    matches = _arena_results[arena_id]["matches"]
+    if match_idx < 0 or match_idx >= len(matches):
+        raise HTTPException(status_code=404, detail="Match not found")
+    if hand_idx < 0 or hand_idx >= len(matches[match_idx]["hands"]):
+        raise HTTPException(status_code=404, detail="Hand not found")
+    try:
+        replay = _hand_replay(arena_id, match_idx, hand_idx)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Hand cannot be replayed: {str(e)}")
+    try:
+        state = replay.state_at(replay.num_moves if move is None else move)
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse({"num_moves": replay.num_moves, **state.to_dict()})
@@ -0,0 +1,30 @@
+"""
+Fast JSON responses for match and arena payloads.
+
+Returning a FastJSONResponse from an endpoint skips FastAPI's
+jsonable_encoder pass, which otherwise walks every nested dict and list of
+the payload before encoding it. Payloads must already be plain JSON types
+(tuples and int dict keys are fine). Uses orjson when it is installed and
+the stdlib encoder with compact separators otherwise.
+"""
+import json
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,18 +1,159 @@
+"""
+Match session storage with per-game locking and optimistic versioning.
+
+By default matches live in this process's memory, which only works with a
+single uvicorn worker. Setting DOMINOES_STORE_DIR to a directory shared by
+every worker (e.g. /dev/shm/dominoes) switches to a pickle-per-game store
+guarded by fcntl file locks, so any worker can serve any game.
+"""
+import os
+import pickle
+import threading
+from contextlib import contextmanager
+from typing import Optional
 from uuid import uuid4
 from dominoes.game import MatchState
+from fileutil import atomic_write
+
+
+class StaleVersionError(Exception):
+    def __init__(self, current_version: int):
+        super().__init__(f"Match state is at version {current_version}")
+        self.current_version = current_version
+
+
+class MemoryStore:
+    def __init__(self):
+        self._matches: dict[str, MatchState] = {}
+        self._versions: dict[str, int] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def create(self, game_id: str, match: MatchState) -> None:
+        with self._guard:
+            self._matches[game_id] = match
+            self._versions[game_id] = 0
+            self._locks[game_id] = threading.Lock()
+
+    def load(self, game_id: str) -> tuple[MatchState, int]:
+        return self._matches[game_id], self._versions[game_id]
+
+    @contextmanager
+    def read(self, game_id: str):
+        # the match object is shared with writers, so hold its lock while reading
+        with self.lock(game_id):
+            yield self.load(game_id)
+
+    def save(self, game_id: str, match: MatchState, version: int) -> int:
+        self._matches[game_id] = match
+        self._versions[game_id] = version + 1
+        return version + 1
+
+    @contextmanager
+    def lock(self, game_id: str):
+        with self._guard:
+            game_lock = self._locks[game_id]
+        with game_lock:
+            yield
+
+
+class FileStore:
+    """Stores each match as a pickle in a directory shared between processes."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, game_id: str, suffix: str) -> str:
+        # game ids come from URLs, so never let them escape the store directory
+        if os.path.basename(game_id) != game_id or game_id.startswith("."):
+            raise KeyError(game_id)
+        return os.path.join(self.directory, game_id + suffix)
 
-_store: dict[str, MatchState] = {}
+    def create(self, game_id: str, match: MatchState) -> None:
+        self._write(game_id, match, 0)
+
+    def load(self, game_id: str) -> tuple[MatchState, int]:
+        try:
+            with open(self._path(game_id, ".pkl"), "rb") as f:
+                version, match = pickle.load(f)
+        except FileNotFoundError:
+            raise KeyError(game_id)
+        return match, version
+
+    @contextmanager
+    def read(self, game_id: str):
+        # each load unpickles a private copy, so no lock is needed
+        yield self.load(game_id)
+
+    def save(self, game_id: str, match: MatchState, version: int) -> int:
+        self._write(game_id, match, version + 1)
+        return version + 1
+
+    def _write(self, game_id: str, match: MatchState, version: int) -> None:
+        with atomic_write(self._path(game_id, ".pkl"), "wb") as f:
+            pickle.dump((version, match), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @contextmanager
+    def lock(self, game_id: str):
+        import fcntl
+
+        if not os.path.exists(self._path(game_id, ".pkl")):
+            raise KeyError(game_id)
+        with open(self._path(game_id, ".lock"), "a") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _make_store():
+    directory = os.environ.get("DOMINOES_STORE_DIR")
+    if directory:
+        return FileStore(directory)
+    return MemoryStore()
+
+
+_store = _make_store()
 
 
 def create_match(match: MatchState) -> str:
     game_id = str(uuid4())
-    _store[game_id] = match
+    _store.create(game_id, match)
     return game_id
 
 
-def get_match(game_id: str) -> MatchState:
-    return _store[game_id]
+@contextmanager
+def read_match(game_id: str):
+    """
+    Yield the match and its version for reading. Serialize the match inside
+    the block: in-memory matches are locked against concurrent moves until
+    it exits. Raises KeyError for unknown games.
+    """
+    with _store.read(game_id) as (match, version):
+        yield match, version
+
+
+def save_match(game_id: str, match: MatchState, version: int) -> int:
+    """
+    Persist a match and return its new version. Call inside locked_match,
+    passing the version it yielded.
+    """
+    return _store.save(game_id, match, version)
+
 
+@contextmanager
+def locked_match(game_id: str, expected_version: Optional[int] = None):
+    """
+    Hold the game's lock for a read-modify-write cycle and yield the match
+    with its current version.
 
-def save_match(game_id: str, match: MatchState) -> None:
-    _store[game_id] = match
+    Raises KeyError for unknown games and StaleVersionError when the caller
+    acted on an older state than the one stored.
+    """
+    with _store.lock(game_id):
+        match, version = _store.load(game_id)
+        if expected_version is not None and expected_version != version:
+            raise StaleVersionError(version)
+        yield match, version